@@ -0,0 +1,220 @@
+import logging
+from datetime import datetime, timedelta
+from sqlmodel import SQLModel, select
+from sqlalchemy import Column, DateTime, Index, MetaData, Table, bindparam, event, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.schema import CreateTable
+from .config import settings
+from .db import ARCHIVE_PATH, engine, read_session, register_schema_ddl
+from .models import Consensus, ImagingReport, MDTCase, PathologyReport, Patient, TreatmentHistory
+
+log = logging.getLogger("app.archive")
+
+# Done cases past archive_after_days move, with their reports, treatments and consensus,
+# into the attached "archive" database. Patients stay in the main database.
+# Children first: that order is used for copying and for deleting.
+ARCHIVED_MODELS = (PathologyReport, ImagingReport, TreatmentHistory, Consensus, MDTCase)
+
+_archive_meta = MetaData()
+
+def _archive_table(model) -> Table:
+    # same columns, no foreign keys: the patient row lives in the other file
+    src = model.__table__
+    key = "patient_id" if model is MDTCase else "mdt_case_id"
+    cols = [Column(c.name, c.type, primary_key=c.primary_key) for c in src.columns]
+    return Table(src.name, _archive_meta, *cols, Index(f"ix_archive_{src.name}_{key}", key), schema="archive")
+
+ARCHIVE_TABLES = {model: _archive_table(model) for model in ARCHIVED_MODELS}
+register_schema_ddl(*(str(CreateTable(t).compile(dialect=sqlite.dialect())) for t in ARCHIVE_TABLES.values()))
+
+def ensure_archive_schema(sync_conn):
+    _archive_meta.create_all(sync_conn)
+    # columns added to the main tables later are added here too, so INSERT ... SELECT stays complete
+    for model, table in ARCHIVE_TABLES.items():
+        have = {row[1] for row in sync_conn.exec_driver_sql(f"PRAGMA archive.table_info({table.name})")}
+        for col in model.__table__.columns:
+            if col.name not in have:
+                sync_conn.exec_driver_sql(f"ALTER TABLE archive.{table.name} ADD COLUMN {col.name} {col.type.compile(sync_conn.dialect)}")
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _install_archive(target, connection, **kw):
+    if ARCHIVE_PATH:
+        ensure_archive_schema(connection)
+
+# --- Ids ---
+# Tables created before the cases were AUTOINCREMENT are rebuilt once, and their sequence
+# starts past every id already in the archive, so no new row takes an archived row's id.
+def _has_archive_table(sync_conn, name: str) -> bool:
+    if "archive" not in {row[1] for row in sync_conn.exec_driver_sql("PRAGMA database_list")}:
+        return False
+    return sync_conn.exec_driver_sql("SELECT 1 FROM archive.sqlite_master WHERE type = 'table' AND name = ?", (name,)).first() is not None
+
+def _ensure_autoincrement(sync_conn, table: Table):
+    sql = sync_conn.exec_driver_sql("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table.name,)).scalar()
+    if sql is None or "AUTOINCREMENT" in sql.upper():
+        return
+    # SQLite can't add AUTOINCREMENT in place: copy into a new table and swap it in. Indexes
+    # and triggers go with the old table; create_all and its hooks put them back.
+    scratch = MetaData()
+    for t in table.metadata.tables.values():
+        t.to_metadata(scratch)  # foreign keys need their target tables to compile
+    tmp = table.to_metadata(scratch, name=f"{table.name}__autoincrement")
+    sync_conn.execute(CreateTable(tmp))
+    cols = ", ".join(c.name for c in table.columns)
+    sync_conn.exec_driver_sql(f"INSERT INTO main.{tmp.name} ({cols}) SELECT {cols} FROM main.{table.name}")
+    sync_conn.exec_driver_sql(f"DROP TABLE main.{table.name}")
+    sync_conn.exec_driver_sql(f"ALTER TABLE main.{tmp.name} RENAME TO {table.name}")
+    if _has_archive_table(sync_conn, table.name):
+        top = sync_conn.exec_driver_sql(f"SELECT max(id) FROM archive.{table.name}").scalar()
+        if top is not None:
+            sync_conn.exec_driver_sql("DELETE FROM main.sqlite_sequence WHERE name = ?", (table.name,))
+            sync_conn.exec_driver_sql(
+                f"INSERT INTO main.sqlite_sequence (name, seq) SELECT ?, max(coalesce((SELECT max(id) FROM main.{table.name}), 0), ?)",
+                (table.name, top),
+            )
+
+@event.listens_for(SQLModel.metadata, "before_create")
+def _migrate_autoincrement(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    for model in ARCHIVED_MODELS:
+        _ensure_autoincrement(connection, model.__table__)
+
+# --- Moving ---
+# SQLite only commits a transaction atomically across attached files when none of them is
+# in WAL mode, and the production profile puts the main file in WAL (the archive keeps the
+# default rollback journal). So a batch is never one cross-file transaction: it is copied
+# and committed in the archive first, and only then deleted from main, and only where main
+# still matches the copy. A crash or an edit in between leaves the case in main (which
+# load_case prefers) with a stale copy that the next run replaces.
+def _batch_params(ids: list[int]) -> tuple[dict, str]:
+    params = {f"id{i}": v for i, v in enumerate(ids)}
+    return params, ", ".join(f":{k}" for k in params)
+
+def _key(model) -> str:
+    return "id" if model is MDTCase else "mdt_case_id"
+
+def _id_clashes(sync_conn, ids: list[int]) -> set[int]:
+    # an archived row of a different case under the same id: only possible for ids handed
+    # out before the tables were AUTOINCREMENT; that case stays in main rather than overwrite it
+    params, id_list = _batch_params(ids)
+    clashes = set(sync_conn.execute(text(
+        f"SELECT m.id FROM main.mdtcase m JOIN archive.mdtcase a ON a.id = m.id WHERE m.id IN ({id_list}) "
+        "AND (a.patient_id IS NOT m.patient_id OR a.created_at IS NOT m.created_at)"
+    ), params).scalars())
+    for model in ARCHIVED_MODELS[:-1]:
+        name = model.__table__.name
+        clashes.update(sync_conn.execute(text(
+            f"SELECT m.mdt_case_id FROM main.{name} m JOIN archive.{name} a ON a.id = m.id "
+            f"WHERE m.mdt_case_id IN ({id_list}) AND a.mdt_case_id IS NOT m.mdt_case_id"
+        ), params).scalars())
+    return clashes
+
+def _delete_rows(sync_conn, schema: str, ids: list[int]):
+    params, id_list = _batch_params(ids)
+    for model in ARCHIVED_MODELS:
+        sync_conn.execute(text(f"DELETE FROM {schema}.{model.__table__.name} WHERE {_key(model)} IN ({id_list})"), params)
+
+def _copy_batch(sync_conn, ids: list[int]) -> list[int]:
+    clashes = _id_clashes(sync_conn, ids)
+    if clashes:
+        log.warning("not archiving cases %s: their ids are taken by other archived rows", sorted(clashes))
+    ids = [i for i in ids if i not in clashes]
+    if not ids:
+        return []
+    # an earlier copy of the same case (interrupted run, or edited since) is replaced whole
+    _delete_rows(sync_conn, "archive", ids)
+    params, id_list = _batch_params(ids)
+    for model in ARCHIVED_MODELS:
+        name = model.__table__.name
+        cols = ", ".join(c.name for c in model.__table__.columns)
+        sync_conn.execute(text(f"INSERT INTO archive.{name} ({cols}) SELECT {cols} FROM main.{name} WHERE {_key(model)} IN ({id_list})"), params)
+    return ids
+
+def _delete_batch(sync_conn, ids: list[int], cutoff: datetime) -> list[int]:
+    # same predicate as the selection, plus "unchanged since the copy": every case and
+    # consensus write stamps updated_at
+    params, id_list = _batch_params(ids)
+    unchanged = list(sync_conn.execute(text(
+        "SELECT m.id FROM main.mdtcase m JOIN archive.mdtcase a ON a.id = m.id "
+        "LEFT JOIN main.consensus mc ON mc.mdt_case_id = m.id LEFT JOIN archive.consensus ac ON ac.mdt_case_id = m.id "
+        f"WHERE m.id IN ({id_list}) AND m.status = 'Done' AND m.updated_at < :cutoff "
+        "AND m.updated_at = a.updated_at AND mc.updated_at IS ac.updated_at"
+    ).bindparams(bindparam("cutoff", type_=DateTime)), {**params, "cutoff": cutoff}).scalars())
+    if unchanged:
+        _delete_rows(sync_conn, "main", unchanged)
+    stale = [i for i in ids if i not in set(unchanged)]
+    if stale:
+        # edited after the copy: main keeps the case, so its outdated copy goes
+        _delete_rows(sync_conn, "archive", stale)
+    return unchanged
+
+async def archive_done_cases(older_than_days: int | None = None, batch_size: int | None = None) -> int:
+    """Move Done cases untouched for older_than_days into the archive; returns the number moved."""
+    from .loader import invalidate_case
+    if not ARCHIVE_PATH:
+        raise RuntimeError("archiving needs a file-based SQLite database")
+    days = settings.archive_after_days if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.archive_batch_size
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    moved = last_id = 0
+    while True:
+        # short write transactions per batch keep the writer available to the app
+        async with engine.begin() as conn:
+            q = (
+                select(MDTCase.id)
+                .where(MDTCase.status == "Done", MDTCase.updated_at < cutoff, MDTCase.id > last_id)
+                .order_by(MDTCase.id).limit(batch_size)
+            )
+            ids = list((await conn.execute(q)).scalars().all())
+            if not ids:
+                return moved
+            last_id = ids[-1]  # cases skipped below aren't picked up again in this run
+            copied = await conn.run_sync(_copy_batch, ids)
+        if not copied:
+            continue
+        async with engine.begin() as conn:
+            done = await conn.run_sync(_delete_batch, copied, cutoff)
+        invalidate_case(*copied)
+        moved += len(done)
+
+# --- Reads ---
+def _detached(model, row) -> SQLModel:
+    return model(**row._mapping)
+
+async def load_archived_case(case_id: int) -> MDTCase | None:
+    """An archived case with its patient and children, as model objects outside any session."""
+    if not ARCHIVE_PATH:
+        return None
+    cases = ARCHIVE_TABLES[MDTCase]
+    async with read_session() as sess:
+        row = (await sess.execute(select(cases).where(cases.c.id == case_id))).first()
+        if row is None:
+            return None
+        case = _detached(MDTCase, row)
+        patient = await sess.get(Patient, case.patient_id)
+        children = {}
+        for model in (PathologyReport, ImagingReport, TreatmentHistory, Consensus):
+            t = ARCHIVE_TABLES[model]
+            children[model] = [_detached(model, r) for r in (await sess.execute(select(t).where(t.c.mdt_case_id == case_id).order_by(t.c.id))).all()]
+    # set_committed_value fills relationships without events, so nothing cascades into a session
+    set_committed_value(case, "patient", patient)
+    set_committed_value(case, "pathology_reports", children[PathologyReport])
+    set_committed_value(case, "imaging_reports", children[ImagingReport])
+    set_committed_value(case, "treatments", children[TreatmentHistory])
+    set_committed_value(case, "consensus", (children[Consensus] or [None])[0])
+    return case
+
+async def archived_cases_for_hn(sess, hn: str, exclude_ids=()) -> list[MDTCase]:
+    """Archived cases of a patient; exclude_ids skips rows still in main mid-archive."""
+    if not ARCHIVE_PATH:
+        return []
+    cases = ARCHIVE_TABLES[MDTCase]
+    q = (
+        select(cases)
+        .join(Patient.__table__, Patient.__table__.c.id == cases.c.patient_id)
+        .where(Patient.__table__.c.hospital_number == hn, cases.c.id.not_in(list(exclude_ids)))
+        .order_by(cases.c.scheduled_date, cases.c.id)
+    )
+    return [_detached(MDTCase, r) for r in (await sess.execute(q)).all()]
@@ -0,0 +1,44 @@
+import hashlib
+import os
+from urllib.parse import parse_qs
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from .compression import decoded_etag
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+class HashedStaticFiles(StaticFiles):
+    """Static files addressed as /static/<path>?v=<content hash>.
+
+    A request carrying the current hash can be cached forever; any edit to the file
+    changes the URL the templates emit. Hashes are computed once at startup.
+    """
+
+    def __init__(self, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.hashes: dict[str, str] = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                full = os.path.join(root, name)
+                with open(full, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()[:12]
+                self.hashes[os.path.relpath(full, directory).replace(os.sep, "/")] = digest
+
+    def url(self, path: str) -> str:
+        digest = self.hashes.get(path)
+        return f"/static/{path}?v={digest}" if digest else f"/static/{path}"
+
+    def is_not_modified(self, response_headers, request_headers) -> bool:
+        # tags sent back as CompressionMiddleware encoded them still name this file
+        if "if-none-match" in request_headers:
+            tags = ", ".join(decoded_etag(t.strip()) for t in request_headers["if-none-match"].split(","))
+            request_headers = Headers(raw=[(k, v) for k, v in request_headers.raw if k != b"if-none-match"] + [(b"if-none-match", tags.encode())])
+        return super().is_not_modified(response_headers, request_headers)
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            version = parse_qs(scope.get("query_string", b"").decode()).get("v", [None])[0]
+            immutable = version is not None and version == self.hashes.get(path.replace(os.sep, "/"))
+            response.headers["Cache-Control"] = IMMUTABLE if immutable else "no-cache"
+        return response
@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import json
+import sys
+from .archive import archive_done_cases
+from .config import settings
+from .db import ARCHIVE_PATH, engine, init_db
+from .export import EXPORT_FORMATS, export_stream
+from .jobs import WorkerPool
+from .pdf import shutdown_pool
+from .importer import IMPORT_KINDS, IMPORT_FORMATS, detect_format, import_records, iter_records
+from .schedule import rebuild_schedule_summary
+from .search import CASE_STATUSES, rebuild_case_fts, rebuild_patient_index
+from .utils import parse_date_range
+
+def _rebuild_fts(args):
+    async def run():
+        await init_db()
+        async with engine.begin() as conn:
+            n = await conn.run_sync(rebuild_case_fts)
+        print(f"Indexed {n} cases")
+    asyncio.run(run())
+
+def _rebuild_patient_index(args):
+    async def run():
+        await init_db()
+        async with engine.begin() as conn:
+            n = await conn.run_sync(rebuild_patient_index)
+        print(f"Indexed {n} patients")
+    asyncio.run(run())
+
+def _rebuild_schedule(args):
+    async def run():
+        await init_db()
+        async with engine.begin() as conn:
+            n = await conn.run_sync(rebuild_schedule_summary)
+        print(f"Counted {n} cases")
+    asyncio.run(run())
+
+def _archive(args):
+    if not ARCHIVE_PATH:
+        sys.exit("archiving needs a file-based SQLite DATABASE_URL")
+
+    async def run():
+        await init_db()
+        n = await archive_done_cases(args.days, args.batch_size)
+        print(f"Archived {n} cases to {ARCHIVE_PATH}")
+    asyncio.run(run())
+
+def _import(args):
+    async def run():
+        await init_db()
+        with open(args.path, "rb") as f:
+            report = await import_records(args.kind, iter_records(f, detect_format(args.path, args.format)), batch_size=args.batch_size)
+        print(json.dumps(report.as_dict(), indent=2))
+    asyncio.run(run())
+
+def _export(args):
+    sd, ed = parse_date_range(args.start, args.end)
+    if (args.start or args.end) and not (sd and ed):
+        sys.exit("--start and --end must both be YYYY-MM-DD dates")
+
+    async def run(out):
+        async for part in export_stream(args.format, sd, ed, args.status, include_archived=not args.no_archived):
+            out.write(part)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            asyncio.run(run(out))
+    else:
+        asyncio.run(run(sys.stdout))
+
+def worker_main(argv=None):
+    """Entry point for mdt-worker: run background jobs outside the web processes."""
+    import logging
+    parser = argparse.ArgumentParser(prog="mdt-worker", description="Run queued MDT App jobs")
+    parser.add_argument("--concurrency", type=int, default=settings.job_workers or 2)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    async def run():
+        await init_db()
+        pool = WorkerPool(args.concurrency)
+        pool.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await pool.stop()
+            shutdown_pool()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mdt", description="MDT App maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-fts", help="Rebuild the full-text index over case and consensus text")
+    p.set_defaults(func=_rebuild_fts)
+
+    p = sub.add_parser("rebuild-patient-index", help="Rebuild the patient name trigram index and phone lookup table")
+    p.set_defaults(func=_rebuild_patient_index)
+
+    p = sub.add_parser("rebuild-schedule", help="Recount the per-date case summary behind the calendar")
+    p.set_defaults(func=_rebuild_schedule)
+
+    p = sub.add_parser("archive", help="Move long-Done cases and their children into the archive database")
+    p.add_argument("--days", type=int, help="archive cases Done and untouched for this many days (default ARCHIVE_AFTER_DAYS)")
+    p.add_argument("--batch-size", type=int)
+    p.set_defaults(func=_archive)
+
+    p = sub.add_parser("import", help="Bulk-import patients or cases from CSV/NDJSON")
+    p.add_argument("kind", choices=IMPORT_KINDS)
+    p.add_argument("path")
+    p.add_argument("--format", choices=IMPORT_FORMATS, help="defaults to the file extension")
+    p.add_argument("--batch-size", type=int)
+    p.set_defaults(func=_import)
+
+    p = sub.add_parser("export", help="Stream cases with patient, reports, treatments and consensus")
+    p.add_argument("--start", help="YYYY-MM-DD; with --end, same range semantics as the date search")
+    p.add_argument("--end")
+    p.add_argument("--status", choices=CASE_STATUSES)
+    p.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    p.add_argument("--no-archived", action="store_true", help="leave out cases moved to the archive")
+    p.add_argument("-o", "--output", help="defaults to stdout")
+    p.set_defaults(func=_export)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import zlib
+from .config import settings
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    b"text/html", b"text/css", b"text/csv", b"text/plain", b"text/javascript",
+    b"application/json", b"application/x-ndjson", b"application/javascript",
+)
+
+# An encoded body is a different representation, so it can't share the app's strong ETag
+# (RFC 9110 8.8.3): the encoding is appended inside the quotes, as in "details-ab12-gzip".
+ENCODINGS = ("gzip", "br")
+
+def encoded_etag(etag: bytes, encoding: str) -> bytes:
+    return etag[:-1] + f'-{encoding}"'.encode() if etag.endswith(b'"') else etag
+
+def decoded_etag(etag: str) -> str:
+    """The app's own tag for a tag this middleware may have sent."""
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+def _choose_encoding(accept: str) -> str | None:
+    offered = {part.split(";")[0].strip() for part in accept.lower().split(",")}
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=settings.brotli_quality)
+        else:
+            self._c = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def chunk(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._c.process(data)
+            return out + (self._c.finish() if final else self._c.flush())
+        # sync-flush each chunk so streamed exports keep streaming
+        return self._c.compress(data) + self._c.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """gzip (or brotli, when installed and accepted) for text-like responses.
+
+    Unlike Starlette's GZipMiddleware it leaves event streams alone and compresses
+    streamed bodies chunk by chunk instead of holding them back.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_headers = dict(scope["headers"])
+        accept = request_headers.get(b"accept-encoding", b"").decode("latin-1")
+        encoding = _choose_encoding(accept)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor: _Compressor | None = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                if start["status"] == 304:
+                    # revalidated: confirm with the tag the client holds, encoded one included
+                    start = {**start, "headers": _revalidated_etag(start.get("headers", []), request_headers)}
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                headers = start.get("headers", [])
+                ctype = next((v for k, v in headers if k == b"content-type"), b"")
+                eligible = (
+                    ctype.startswith(COMPRESSIBLE_TYPES)
+                    and not any(k == b"content-encoding" for k, _ in headers)
+                    and (more or len(body) >= settings.compress_min_bytes)
+                )
+                if not eligible:
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                compressor = _Compressor(encoding)
+                headers = [(k, encoded_etag(v, encoding) if k == b"etag" else v) for k, v in headers if k != b"content-length"]
+                headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+                await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressor.chunk(body, final=not more), "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
+
+def _revalidated_etag(headers: list, request_headers: dict) -> list:
+    sent = [t.strip() for t in request_headers.get(b"if-none-match", b"").split(b",")]
+    out = []
+    for k, v in headers:
+        if k == b"etag":
+            v = next((t for t in sent if t != v and decoded_etag(t.decode("latin-1")).encode() == v), v)
+        out.append((k, v))
+    return out
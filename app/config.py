@@ -5,9 +5,58 @@ class Settings(BaseSettings):
     app_name: str = "MDT App"
     secret_key: str = Field(default="change-me-please", description="Used for signing session cookies")
     database_url: str = "sqlite+aiosqlite:///./mdt.db"
+    db_profile: str = Field(default="default", description='"production" enables WAL, tuned pragmas and split read/write pools')
+    db_read_pool_size: int = 4
+    db_write_timeout_s: float = 30
+    db_busy_timeout_ms: int = 5000
+    db_mmap_size_mb: int = 256
+    db_cache_size_mb: int = 64
+    db_checkpoint_interval_s: int = 300
+    db_optimize_interval_s: int = 3600
     pdf_margin_top_mm: int = 15
     pdf_margin_right_mm: int = 15
     pdf_margin_bottom_mm: int = 15
     pdf_margin_left_mm: int = 15
+    pdf_workers: int = Field(default=2, description="Worker processes used for PDF rendering")
+    pdf_cache_max_mb: int = Field(default=64, description="Upper bound for the in-memory cache of finished PDFs")
+
+    search_page_size: int = 50
+    search_max_page_size: int = 500
+    patient_search_limit: int = 20
+    patient_search_max_limit: int = 100
+    import_batch_size: int = 5000
+    import_max_reported_errors: int = 1000
+    export_chunk_size: int = 500
+    case_cache_size: int = 512
+    case_cache_ttl_seconds: float = Field(default=30, description="How long another worker's write can go unseen")
+    slow_request_ms: int = 500
+    perf_debug: bool = Field(default=False, description="Development aid: Server-Timing headers and N+1 query warnings")
+    n_plus_one_threshold: int = 5
+    bcrypt_rounds: int = Field(default=12, description="Hashes with a different cost are rehashed on the next login")
+    password_workers: int = 4
+    password_queue_size: int = Field(default=32, description="Hash/verify jobs allowed to wait for a worker before logins get 429")
+    password_per_ip: int = Field(default=0, description=(
+        "Concurrent hash/verify jobs per client address; 0 disables. The address is the "
+        "connecting peer, so behind a reverse proxy or NAT every user shares one: leave it off "
+        "there, or run uvicorn with --proxy-headers and --forwarded-allow-ips to see real clients"
+    ))
+    session_cache_size: int = 1024
+    feed_queue_size: int = 256
+    feed_heartbeat_s: float = 15
+    archive_database_path: str = Field(default="", description="SQLite file for archived cases; defaults to <db>_archive.db beside the main database")
+    archive_after_days: int = 365
+    archive_batch_size: int = 500
+    job_workers: int = Field(default=2, description="Concurrent jobs per worker process; 0 disables the in-app worker")
+    job_results_dir: str = "./job_results"
+    job_poll_interval_s: float = 1.0
+    job_lease_s: int = Field(default=900, description="A running job not finished within this is assumed lost and requeued")
+    job_retry_backoff_s: float = 5
+    job_result_ttl_hours: int = 24
+    startup_budget_ms: int = Field(default=2000, description="Cold starts slower than this are logged as warnings")
+    jinja_cache_dir: str = Field(default="./.jinja_cache", description="Compiled template cache shared by all workers; empty disables")
+    compress_min_bytes: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    config_check_interval_s: float = Field(default=5, description="How often a worker checks the config version row")
 
 settings = Settings()
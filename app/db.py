@@ -1,11 +1,148 @@
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
 from sqlmodel import SQLModel
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-engine = create_async_engine(settings.database_url, echo=False, future=True)
+log = logging.getLogger("app.db")
+
+# --- Engine profile ---
+# "default" keeps the single stock engine. "production" (SQLite files only) runs in WAL
+# mode with tuned pragmas, a pool of read connections and a single serialized writer,
+# so a consensus save during a meeting no longer blocks everybody's page loads.
+def _is_sqlite_file(url: str) -> bool:
+    u = make_url(url)
+    return u.get_backend_name() == "sqlite" and u.database not in (None, "", ":memory:")
+
+PRODUCTION = settings.db_profile == "production" and _is_sqlite_file(settings.database_url)
+
+def _archive_path() -> str | None:
+    if settings.archive_database_path:
+        return settings.archive_database_path
+    if not _is_sqlite_file(settings.database_url):
+        return None
+    main = Path(make_url(settings.database_url).database)
+    return str(main.with_name(f"{main.stem}_archive{main.suffix}"))
+
+# Every connection sees archived cases as "archive.<table>"; see app/archive.py
+ARCHIVE_PATH = _archive_path()
+
+def _attach_archive(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_PATH,))
+    # pinned to the rollback journal: archive writes are rare and batched, and see
+    # app/archive.py for why a batch is committed in two steps regardless
+    cursor.execute("PRAGMA archive.journal_mode=DELETE")
+    cursor.close()
+
+def _sqlite_pragmas(read_only: bool):
+    pragmas = [
+        f"PRAGMA busy_timeout={settings.db_busy_timeout_ms}",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={settings.db_mmap_size_mb * 1024 * 1024}",
+        f"PRAGMA cache_size=-{settings.db_cache_size_mb * 1024}",  # negative = KiB
+        "PRAGMA temp_store=MEMORY",
+    ]
+    # journal_mode is persistent in the file; the writer sets it before any reader connects
+    pragmas.append("PRAGMA query_only=ON" if read_only else "PRAGMA journal_mode=WAL")
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return on_connect
+
+def _make_engine(read_only: bool = False):
+    if not PRODUCTION:
+        eng = create_async_engine(settings.database_url, echo=False, future=True)
+    else:
+        if read_only:
+            pool = {"pool_size": settings.db_read_pool_size, "max_overflow": 0}
+        else:
+            # one connection: writers queue here instead of spinning on SQLITE_BUSY
+            pool = {"pool_size": 1, "max_overflow": 0, "pool_timeout": settings.db_write_timeout_s}
+        eng = create_async_engine(settings.database_url, echo=False, future=True, **pool)
+        event.listen(eng.sync_engine, "connect", _sqlite_pragmas(read_only))
+    if ARCHIVE_PATH:
+        event.listen(eng.sync_engine, "connect", _attach_archive)
+    return eng
+
+engine = _make_engine()
+read_engine = _make_engine(read_only=True) if PRODUCTION else engine
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+read_session = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+# --- Schema ---
+# DDL that after_create hooks run outside SQLModel.metadata (FTS tables, triggers, the
+# archive schema) is registered here so it counts towards the schema fingerprint.
+_extra_ddl: list[str] = []
+
+def register_schema_ddl(*statements: str):
+    _extra_ddl.extend(statements)
+
+def schema_fingerprint() -> int:
+    """A 28-bit hash of the full schema, stored in PRAGMA user_version."""
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateIndex, CreateTable
+    dialect = sqlite.dialect()
+    parts = []
+    for table in SQLModel.metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=dialect)))
+        parts += sorted(str(CreateIndex(i).compile(dialect=dialect)) for i in table.indexes)
+    parts += _extra_ddl
+    return int(hashlib.sha256("\n".join(parts).encode()).hexdigest()[:7], 16) or 1
 
-async def init_db():
+async def init_db(force: bool = False) -> bool:
+    """Create or migrate the schema; skipped when user_version already matches. Returns True if it ran."""
+    fingerprint = schema_fingerprint()
     async with engine.begin() as conn:
+        versions = [(await conn.exec_driver_sql("PRAGMA user_version")).scalar()]
+        if ARCHIVE_PATH:
+            versions.append((await conn.exec_driver_sql("PRAGMA archive.user_version")).scalar())
+        if not force and all(v == fingerprint for v in versions):
+            return False
         await conn.run_sync(SQLModel.metadata.create_all)
+        # create_all skips tables that already exist, including indexes added to them later
+        await conn.run_sync(_create_missing_indexes)
+        await conn.exec_driver_sql(f"PRAGMA user_version = {fingerprint}")
+        if ARCHIVE_PATH:
+            await conn.exec_driver_sql(f"PRAGMA archive.user_version = {fingerprint}")
+    log.info("schema created or updated (fingerprint %07x)", fingerprint)
+    return True
+
+def _create_missing_indexes(sync_conn):
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+# --- Maintenance ---
+async def run_maintenance(optimize: bool = False):
+    async with engine.connect() as conn:
+        if optimize:
+            await conn.exec_driver_sql("PRAGMA optimize")
+        if PRODUCTION:
+            await conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)")
+
+async def maintenance_loop():
+    """Checkpoint the WAL regularly and refresh planner statistics less often."""
+    interval = settings.db_checkpoint_interval_s
+    per_optimize = max(1, settings.db_optimize_interval_s // interval)
+    tick = 0
+    while True:
+        await asyncio.sleep(interval)
+        tick += 1
+        try:
+            await run_maintenance(optimize=tick % per_optimize == 0)
+        except Exception:
+            log.exception("database maintenance failed")
+
+async def dispose_engines():
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
@@ -0,0 +1,110 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import select
+from .archive import ARCHIVE_TABLES
+from .config import settings
+from .db import ARCHIVE_PATH, read_session
+from .models import MDTCase, Patient, PathologyReport, ImagingReport, TreatmentHistory, Consensus
+from .search import CASE_RANGE_ORDER, case_range_filter
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+_CASE_COLUMNS = [c.name for c in MDTCase.__table__.columns]
+_PATIENT_COLUMNS = [c.name for c in Patient.__table__.columns if c.name != "id"]
+_CHILD_COLUMNS = ["pathology_reports", "imaging_reports", "treatments", "consensus"]
+CSV_HEADER = _CASE_COLUMNS + [f"patient_{c}" for c in _PATIENT_COLUMNS] + _CHILD_COLUMNS + ["archived"]
+
+_CHILD_MODELS = (PathologyReport, ImagingReport, TreatmentHistory, Consensus)
+
+# Rows are read through Core tables rather than ORM entities: nothing lands in the
+# session identity map, so a long export doesn't accumulate objects chunk after chunk.
+def _record(row) -> dict:
+    return {k: v.isoformat() if isinstance(v, (date, datetime)) else v for k, v in row._mapping.items()}
+
+async def _children_by_case(sess, table, ids: list[int]) -> dict[int, list]:
+    grouped = defaultdict(list)
+    for row in (await sess.execute(select(table).where(table.c.mdt_case_id.in_(ids)).order_by(table.c.id))).all():
+        grouped[row.mdt_case_id].append(_record(row))
+    return grouped
+
+def _case_queries(sd, ed, status, include_archived: bool):
+    """(archived, case query, child tables) for the live cases, then the archived ones."""
+    live = select(MDTCase.__table__).where(*case_range_filter(sd, ed, status)).order_by(*CASE_RANGE_ORDER)
+    yield False, live, {m: m.__table__ for m in _CHILD_MODELS}
+    if include_archived and ARCHIVE_PATH:
+        cases = ARCHIVE_TABLES[MDTCase]
+        # the archive has no schedule index, so its cases follow in id order; a case caught
+        # mid-archive is still in main and was exported there
+        q = (
+            select(cases)
+            .where(*case_range_filter(sd, ed, status, table=cases), cases.c.id.not_in(select(MDTCase.id)))
+            .order_by(cases.c.id)
+        )
+        yield True, q, {m: ARCHIVE_TABLES[m] for m in _CHILD_MODELS}
+
+async def iter_case_records(sd: date | None = None, ed: date | None = None, status: str | None = None,
+                            chunk_size: int | None = None, include_archived: bool = True):
+    """Yield lists of fully populated case dicts, one list per chunk.
+
+    Cases are read through a server-side cursor (yield_per) and each chunk's children are
+    fetched with one IN query per table, so memory is bounded by the chunk size. Archived
+    cases come after the live ones unless include_archived is False.
+    """
+    chunk_size = chunk_size or settings.export_chunk_size
+    patient_table = Patient.__table__
+    async with read_session() as sess:
+        for archived, q, children in _case_queries(sd, ed, status, include_archived):
+            result = await sess.stream(q.execution_options(yield_per=chunk_size))
+            async for rows in result.partitions():
+                cases = [_record(r) for r in rows]
+                ids = [c["id"] for c in cases]
+                patient_ids = {c["patient_id"] for c in cases}
+                patients = {
+                    r.id: _record(r)
+                    for r in (await sess.execute(select(patient_table).where(patient_table.c.id.in_(patient_ids)))).all()
+                }
+                pathology = await _children_by_case(sess, children[PathologyReport], ids)
+                imaging = await _children_by_case(sess, children[ImagingReport], ids)
+                treatments = await _children_by_case(sess, children[TreatmentHistory], ids)
+                consensus = {cid: items[0] for cid, items in (await _children_by_case(sess, children[Consensus], ids)).items()}
+                for c in cases:
+                    c["patient"] = patients.get(c["patient_id"])
+                    c["pathology_reports"] = pathology.get(c["id"], [])
+                    c["imaging_reports"] = imaging.get(c["id"], [])
+                    c["treatments"] = treatments.get(c["id"], [])
+                    c["consensus"] = consensus.get(c["id"])
+                    c["archived"] = archived
+                yield cases
+
+async def stream_ndjson(chunks):
+    async for records in chunks:
+        yield "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+
+def _csv_row(record: dict) -> list:
+    patient = record["patient"] or {}
+    return (
+        [record[c] for c in _CASE_COLUMNS]
+        + [patient.get(c) for c in _PATIENT_COLUMNS]
+        + [json.dumps(record[c], ensure_ascii=False) if record[c] is not None else "" for c in _CHILD_COLUMNS]
+        + [record["archived"]]
+    )
+
+async def stream_csv(chunks):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_HEADER)
+    async for records in chunks:
+        writer.writerows(_csv_row(r) for r in records)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+def export_stream(fmt: str, sd: date | None = None, ed: date | None = None, status: str | None = None,
+                  include_archived: bool = True):
+    chunks = iter_case_records(sd, ed, status, include_archived=include_archived)
+    return stream_csv(chunks) if fmt == "csv" else stream_ndjson(chunks)
@@ -0,0 +1,113 @@
+import asyncio
+import json
+from datetime import date
+from sqlmodel import select
+from sqlalchemy.orm import joinedload
+from .config import settings
+from .db import read_session
+from .models import MDTCase
+
+class CaseChange:
+    """One changed case, shared by every subscriber; its event payload is built once.
+
+    previous_date is the date a rescheduled case moved away from, so viewers of that
+    date can drop the row.
+    """
+    __slots__ = ("case", "previous_date", "_payload")
+
+    def __init__(self, case: MDTCase, previous_date: date | None = None):
+        self.case = case
+        self.previous_date = previous_date
+        self._payload = None
+
+    def payload(self, render_row) -> str:
+        if self._payload is None:
+            c = self.case
+            self._payload = json.dumps({
+                "id": c.id,
+                "scheduled_date": c.scheduled_date.isoformat() if c.scheduled_date else None,
+                "status": c.status,
+                "sort": case_sort_key(c),
+                "html": render_row(c),
+            })
+        return self._payload
+
+    def removed_payload(self) -> str:
+        return json.dumps({"id": self.case.id})
+
+def case_sort_key(case: MDTCase) -> str:
+    # string form of CASE_RANGE_ORDER so the browser can place a row without another query
+    return f"{case.scheduled_date}|{case.status}|{case.id:010d}"
+
+class Subscription:
+    def __init__(self, start: date, end: date, queue_size: int):
+        self.start = start
+        self.end = end
+        self.queue: asyncio.Queue[CaseChange | None] = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+    def covers(self, day: date | None) -> bool:
+        return day is not None and self.start <= day <= self.end
+
+    def wants(self, change: CaseChange) -> bool:
+        return self.covers(change.case.scheduled_date) or self.covers(change.previous_date)
+
+    def event(self, change: CaseChange, render_row) -> str:
+        if self.covers(change.case.scheduled_date):
+            return f"event: case\ndata: {change.payload(render_row)}\n\n"
+        return f"event: removed\ndata: {change.removed_payload()}\n\n"
+
+class ChangeFeed:
+    """In-process fan-out of case changes to live date-range viewers.
+
+    Write paths call publish_cases() after commit. A subscriber that falls a full queue
+    behind is told to reload rather than being allowed to hold memory.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.published = 0
+        self._subs: set[Subscription] = set()
+
+    def subscribe(self, start: date, end: date) -> Subscription:
+        sub = Subscription(start, end, self.queue_size)
+        self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subs.discard(sub)
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subs)
+
+    def publish(self, cases, previous_dates: dict[int, date | None] | None = None):
+        previous_dates = previous_dates or {}
+        changes = [CaseChange(c, previous_dates.get(c.id)) for c in cases]
+        self.published += len(changes)
+        for sub in list(self._subs):
+            for change in changes:
+                if not sub.wants(change):
+                    continue
+                try:
+                    sub.queue.put_nowait(change)
+                except asyncio.QueueFull:
+                    sub.overflowed = True
+                    self._subs.discard(sub)
+                    break
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subs), "published": self.published}
+
+feed = ChangeFeed(settings.feed_queue_size)
+
+async def publish_cases(*ids: int, previous_dates: dict[int, date | None] | None = None):
+    """Load the changed cases once and hand them to every interested viewer.
+
+    previous_dates maps rescheduled case ids to the date they were moved from.
+    """
+    if not feed.active or not ids:
+        return
+    async with read_session() as sess:
+        q = select(MDTCase).where(MDTCase.id.in_(ids)).options(joinedload(MDTCase.patient))
+        feed.publish((await sess.exec(q)).all(), previous_dates)
@@ -0,0 +1,194 @@
+import csv
+import io
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from pydantic import ValidationError, create_model
+from sqlalchemy import insert
+from sqlmodel import select
+from .config import settings
+from .db import async_session
+from .feed import publish_cases
+from .loader import invalidate_case
+from .models import Patient, MDTCase, Consensus, PatientPhone
+from .schedule import adjust_schedule_counts
+from .search import patient_phone_rows
+
+IMPORT_KINDS = ("patients", "cases")
+IMPORT_FORMATS = ("csv", "ndjson")
+
+@dataclass
+class ImportReport:
+    kind: str
+    rows: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+
+    def error(self, row: int, message: str, duplicate: bool = False):
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.failed += 1
+        # the counters stay exact; only the per-row detail is capped so huge bad files can't grow memory
+        if len(self.errors) < settings.import_max_reported_errors:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "kind": self.kind, "rows": self.rows, "inserted": self.inserted,
+            "duplicates": self.duplicates, "failed": self.failed,
+            "errors": self.errors, "errors_truncated": self.duplicates + self.failed > len(self.errors),
+        }
+
+def _row_model(table_model):
+    # Same field types and defaults as the table model, minus the ORM instrumentation that
+    # makes validating a table=True SQLModel several times slower per row.
+    fields = {name: (f.annotation, f) for name, f in table_model.model_fields.items() if name != "id"}
+    return create_model(f"{table_model.__name__}Row", **fields)
+
+PatientRow = _row_model(Patient)
+CaseRow = _row_model(MDTCase)
+
+# --- Parsing ---
+def detect_format(filename: str | None, fmt: str | None = None) -> str:
+    if fmt:
+        return fmt
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+def iter_records(binary_file, fmt: str):
+    """Yield (row_number, dict | error message) one line at a time."""
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for n, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield n, f"invalid JSON: {exc}"
+            continue
+        yield n, record if isinstance(record, dict) else "expected a JSON object"
+
+def _clean(record: dict) -> dict:
+    # empty cells are dropped rather than set to None so model defaults still apply
+    out = {}
+    for k, v in record.items():
+        if k is None or v is None:
+            continue
+        v = json.dumps(v) if isinstance(v, (list, dict)) else str(v).strip()
+        if v != "":
+            out[k.strip()] = v
+    return out
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+
+# --- Batches ---
+async def _insert_patients(batch: list[tuple[int, dict]], report: ImportReport):
+    seen, rows = set(), []
+    for n, record in batch:
+        data = _clean(record)
+        if "additional_phones" in data and "additional_phones_json" not in data:
+            data["additional_phones_json"] = data.pop("additional_phones")
+        data.setdefault("additional_phones_json", "[]")
+        try:
+            p = PatientRow.model_validate(data)
+        except ValidationError as exc:
+            report.error(n, _validation_message(exc))
+            continue
+        if p.hospital_number in seen:
+            report.error(n, f"duplicate hospital_number {p.hospital_number} in file", duplicate=True)
+            continue
+        seen.add(p.hospital_number)
+        rows.append((n, p.model_dump()))
+    if not rows:
+        return
+
+    async with async_session() as sess:
+        hns = [r["hospital_number"] for _, r in rows]
+        existing = set((await sess.exec(select(Patient.hospital_number).where(Patient.hospital_number.in_(hns)))).all())
+        fresh = []
+        for n, r in rows:
+            if r["hospital_number"] in existing:
+                report.error(n, f"hospital_number {r['hospital_number']} already registered", duplicate=True)
+            else:
+                fresh.append(r)
+        if not fresh:
+            return
+        # Core executemany is a single round trip; ORM bulk insert with RETURNING is far slower here
+        await sess.execute(insert(Patient.__table__), fresh)
+        ids = dict((await sess.exec(select(Patient.hospital_number, Patient.id).where(Patient.hospital_number.in_(hns)))).all())
+        phones = [ph for r in fresh for ph in patient_phone_rows(ids[r["hospital_number"]], r["phone_primary"], r["additional_phones_json"])]
+        if phones:
+            await sess.execute(insert(PatientPhone.__table__), phones)
+        await sess.commit()
+    report.inserted += len(fresh)
+
+async def _insert_cases(batch: list[tuple[int, dict]], report: ImportReport):
+    records = [(n, _clean(r)) for n, r in batch]
+    hns = {r.get("hospital_number") for _, r in records if r.get("hospital_number")}
+    async with async_session() as sess:
+        patient_ids = dict((await sess.exec(select(Patient.hospital_number, Patient.id).where(Patient.hospital_number.in_(hns)))).all()) if hns else {}
+        cases, consensus = [], []
+        for n, data in records:
+            hn = data.pop("hospital_number", None)
+            if hn not in patient_ids:
+                report.error(n, f"unknown hospital_number {hn}")
+                continue
+            consensus_text = data.pop("consensus_text", None)
+            followups = data.pop("followups_json", None) or data.pop("followups", None)
+            data["patient_id"] = patient_ids[hn]
+            try:
+                case = CaseRow.model_validate(data)
+            except ValidationError as exc:
+                report.error(n, _validation_message(exc))
+                continue
+            cases.append(case.model_dump())
+            consensus.append((consensus_text, followups))
+        if not cases:
+            return
+        table = MDTCase.__table__
+        ids = (await sess.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), cases)).scalars().all()
+        consensus_rows = [
+            {"mdt_case_id": cid, "consensus_text": text, "followups_json": followups or "[]"}
+            for cid, (text, followups) in zip(ids, consensus) if text
+        ]
+        if consensus_rows:
+            await sess.execute(insert(Consensus.__table__), consensus_rows)
+        await adjust_schedule_counts(sess, Counter((c["scheduled_date"], c["status"]) for c in cases))
+        await sess.commit()
+    invalidate_case(*ids)
+    await publish_cases(*ids)
+    report.inserted += len(cases)
+
+_INSERTERS = {"patients": _insert_patients, "cases": _insert_cases}
+
+async def import_records(kind: str, records, batch_size: int | None = None) -> ImportReport:
+    """Insert parsed records in batches, one transaction per batch.
+
+    Only one batch is held at a time, so memory stays flat regardless of input size.
+    """
+    batch_size = batch_size or settings.import_batch_size
+    insert_batch = _INSERTERS[kind]
+    report = ImportReport(kind=kind)
+    batch = []
+    for n, record in records:
+        report.rows += 1
+        if isinstance(record, str):
+            report.error(n, record)
+            continue
+        batch.append((n, record))
+        if len(batch) >= batch_size:
+            await insert_batch(batch, report)
+            batch = []
+    if batch:
+        await insert_batch(batch, report)
+    return report
@@ -0,0 +1,301 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import time
+import traceback
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from sqlmodel import select
+from sqlalchemy import delete, update
+from .config import settings
+from .db import async_session, read_session
+from .models import Job
+
+log = logging.getLogger("app.jobs")
+
+# --- Handlers ---
+# A handler gets the job's params and the path its result file should be written to, and
+# returns how that file should be served. PermanentJobError fails the job without retries.
+class PermanentJobError(Exception):
+    pass
+
+@dataclass
+class JobResult:
+    media_type: str
+    filename: str
+
+@dataclass
+class JobKind:
+    handler: object
+    admin_only: bool = False
+
+JOB_KINDS: dict[str, JobKind] = {}
+
+def job_handler(kind: str, admin_only: bool = False):
+    def register(fn):
+        JOB_KINDS[kind] = JobKind(fn, admin_only)
+        return fn
+    return register
+
+@job_handler("case_pdf")
+async def _case_pdf_job(params: dict, out_path: str) -> JobResult:
+    from .loader import load_case
+    from .pdf import case_pdf
+    entry = await load_case(int(params["case_id"]))
+    if not entry:
+        raise PermanentJobError("Case not found")
+    with open(out_path, "wb") as f:
+        f.write(await case_pdf(entry.case))
+    return JobResult("application/pdf", f"mdt-case-{entry.case.id}.pdf")
+
+@job_handler("meeting_pack")
+async def _meeting_pack_job(params: dict, out_path: str) -> JobResult:
+    from .loader import load_cases_in_range
+    from .pdf import render_cases_html, render_pdf_to_file, stream_case_zip
+    from .utils import parse_date_range
+    sd, ed = parse_date_range(params.get("start"), params.get("end"))
+    fmt = params.get("format", "zip")
+    if not (sd and ed) or fmt not in ("zip", "pdf"):
+        raise PermanentJobError("Invalid date range or format")
+    cases = await load_cases_in_range(sd, ed)
+    if not cases:
+        raise PermanentJobError("No cases in range")
+    name = f"mdt-pack_{sd}_{ed}.{fmt}"
+    if fmt == "zip":
+        with open(out_path, "wb") as f:
+            async for part in stream_case_zip(cases):
+                f.write(part)
+        return JobResult("application/zip", name)
+    tmp = await render_pdf_to_file(render_cases_html(cases))
+    shutil.move(tmp, out_path)
+    return JobResult("application/pdf", name)
+
+@job_handler("archive", admin_only=True)
+async def _archive_job(params: dict, out_path: str) -> JobResult:
+    from .archive import archive_done_cases
+    n = await archive_done_cases(params.get("days"), params.get("batch_size"))
+    with open(out_path, "w") as f:
+        json.dump({"archived": n}, f)
+    return JobResult("application/json", "archive.json")
+
+@job_handler("export", admin_only=True)
+async def _export_job(params: dict, out_path: str) -> JobResult:
+    from .export import EXPORT_FORMATS, export_stream
+    from .utils import parse_date_range
+    fmt = params.get("format", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        raise PermanentJobError("format must be ndjson or csv")
+    sd, ed = parse_date_range(params.get("start"), params.get("end"))
+    with open(out_path, "w", encoding="utf-8", newline="") as f:
+        async for part in export_stream(fmt, sd, ed, params.get("status"), include_archived=params.get("archived", True)):
+            f.write(part)
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return JobResult(media_type, f"mdt-cases_{sd or 'all'}_{ed or 'all'}.{fmt}")
+
+@job_handler("import", admin_only=True)
+async def _import_job(params: dict, out_path: str) -> JobResult:
+    from .importer import IMPORT_FORMATS, IMPORT_KINDS, import_records, iter_records
+    # the upload was saved by the endpoint; submitted with max_attempts=1, since running a
+    # half-finished import again would insert its cases twice
+    upload = params.get("upload") or ""
+    # params can also come from POST /jobs/import: never read (and delete) anything but an upload
+    if os.path.dirname(os.path.abspath(upload)) != os.path.abspath(settings.job_results_dir) or not os.path.basename(upload).startswith("upload-"):
+        raise PermanentJobError("not an uploaded file")
+    if not os.path.exists(upload):
+        raise PermanentJobError("uploaded file is gone")
+    if params.get("kind") not in IMPORT_KINDS or params.get("format") not in IMPORT_FORMATS:
+        raise PermanentJobError("invalid import kind or format")
+    try:
+        with open(upload, "rb") as f:
+            report = await import_records(params["kind"], iter_records(f, params["format"]))
+    finally:
+        os.unlink(upload)
+    with open(out_path, "w") as f:
+        json.dump(report.as_dict(), f)
+    return JobResult("application/json", "import.json")
+
+def upload_path(name: str) -> str:
+    """Where an endpoint keeps an uploaded file until its job has read it."""
+    os.makedirs(settings.job_results_dir, exist_ok=True)
+    return os.path.join(settings.job_results_dir, f"upload-{uuid.uuid4().hex}-{os.path.basename(name or 'file')}")
+
+# --- Queue ---
+async def submit_job(kind: str, params: dict, max_attempts: int = 3) -> Job:
+    if kind not in JOB_KINDS:
+        raise ValueError(f"unknown job kind {kind}")
+    async with async_session() as sess:
+        job = Job(kind=kind, params_json=json.dumps(params), max_attempts=max_attempts)
+        sess.add(job)
+        await sess.commit()
+        await sess.refresh(job)
+    _wakeup.set()
+    return job
+
+async def get_job(job_id: int) -> Job | None:
+    async with read_session() as sess:
+        return await sess.get(Job, job_id)
+
+def job_status(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+        "result_url": f"/jobs/{job.id}/result" if job.status == "done" else None,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat(),
+    }
+
+def _result_path(job_id: int) -> str:
+    return os.path.join(settings.job_results_dir, f"job-{job_id}")
+
+async def _claim(worker_id: str) -> Job | None:
+    now = datetime.utcnow()
+    # look before taking the write lock: an idle queue costs only reads
+    async with read_session() as sess:
+        ready = (await sess.exec(select(Job.id).where(Job.status == "queued", Job.run_after <= now).order_by(Job.id).limit(1))).first()
+    if ready is None:
+        return None
+    async with async_session() as sess:
+        # single UPDATE: when several processes race for the row, exactly one gets it
+        res = await sess.execute(
+            update(Job)
+            .where(Job.id == ready, Job.status == "queued")
+            .values(status="running", locked_by=worker_id, locked_at=now, attempts=Job.attempts + 1, updated_at=now)
+        )
+        await sess.commit()
+        if res.rowcount == 0:
+            return None
+        return await sess.get(Job, ready)
+
+async def _finish(job: Job, result: JobResult | None = None, error: BaseException | None = None):
+    now = datetime.utcnow()
+    values = {"locked_by": None, "locked_at": None, "updated_at": now}
+    if error is None:
+        values.update(status="done", error=None, result_path=_result_path(job.id),
+                      result_media_type=result.media_type, result_filename=result.filename)
+    else:
+        message = "".join(traceback.format_exception_only(type(error), error)).strip()
+        retry = job.attempts < job.max_attempts and not isinstance(error, PermanentJobError)
+        values.update(status="queued" if retry else "failed", error=message)
+        if retry:
+            values["run_after"] = now + timedelta(seconds=settings.job_retry_backoff_s * 2 ** (job.attempts - 1))
+    async with async_session() as sess:
+        await sess.execute(update(Job).where(Job.id == job.id).values(**values))
+        await sess.commit()
+
+async def _run(job: Job):
+    kind = JOB_KINDS.get(job.kind)
+    out_path = _result_path(job.id)
+    try:
+        if kind is None:
+            raise PermanentJobError(f"unknown job kind {job.kind}")
+        result = await kind.handler(json.loads(job.params_json), out_path)
+    except Exception as exc:
+        log.warning("job %s (%s) attempt %d failed: %s", job.id, job.kind, job.attempts, exc)
+        if os.path.exists(out_path):
+            os.unlink(out_path)
+        await _finish(job, error=exc)
+    else:
+        await _finish(job, result=result)
+
+async def _housekeeping():
+    now = datetime.utcnow()
+    lost = (Job.status == "running", Job.locked_at < now - timedelta(seconds=settings.job_lease_s))
+    async with async_session() as sess:
+        # a worker that died mid-job leaves it "running"; after the lease it goes back in the
+        # queue, unless it has used up its attempts (a job that keeps killing its worker)
+        await sess.execute(
+            update(Job)
+            .where(*lost, Job.attempts >= Job.max_attempts)
+            .values(status="failed", error="worker lost: lease expired", locked_by=None, locked_at=None, updated_at=now)
+        )
+        await sess.execute(
+            update(Job)
+            .where(*lost)
+            .values(status="queued", locked_by=None, locked_at=None, updated_at=now)
+        )
+        expired = dict((await sess.exec(select(Job.id, Job.params_json).where(
+            Job.status.in_(("done", "failed")), Job.updated_at < now - timedelta(hours=settings.job_result_ttl_hours),
+        ))).all())
+        if expired:
+            await sess.execute(delete(Job).where(Job.id.in_(list(expired))))
+        await sess.commit()
+    for job_id, params_json in expired.items():
+        # an import whose worker died never got to remove its upload
+        for path in (_result_path(job_id), json.loads(params_json).get("upload")):
+            if path and os.path.exists(path):
+                os.unlink(path)
+
+_wakeup = asyncio.Event()
+_HOUSEKEEPING_INTERVAL_S = 60
+
+class WorkerPool:
+    """Runs queued jobs with at most `concurrency` in flight in this process."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._task: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    def start(self):
+        os.makedirs(settings.job_results_dir, exist_ok=True)
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+        # hand interrupted jobs straight back instead of waiting out their lease
+        async with async_session() as sess:
+            await sess.execute(
+                update(Job)
+                .where(Job.status == "running", Job.locked_by == self.worker_id)
+                .values(status="queued", locked_by=None, locked_at=None, attempts=Job.attempts - 1, updated_at=datetime.utcnow())
+            )
+            await sess.commit()
+
+    async def run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        last_housekeeping = 0.0
+        while True:
+            if time.monotonic() - last_housekeeping >= _HOUSEKEEPING_INTERVAL_S:
+                last_housekeeping = time.monotonic()
+                try:
+                    await _housekeeping()
+                except Exception:
+                    log.exception("job housekeeping failed")
+            await slots.acquire()
+            try:
+                job = await _claim(self.worker_id)
+            except Exception:
+                log.exception("claiming a job failed")
+                job = None
+            if job is None:
+                slots.release()
+                _wakeup.clear()
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), settings.job_poll_interval_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._run_one(job, slots))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_one(self, job: Job, slots: asyncio.Semaphore):
+        try:
+            await _run(job)
+        finally:
+            slots.release()
+
+    def stats(self) -> dict:
+        return {"worker_id": self.worker_id, "concurrency": self.concurrency, "running": len(self._running)}
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import date
+from sqlmodel import select
+from sqlalchemy.orm import selectinload
+from .config import settings
+from .archive import load_archived_case
+from .compression import decoded_etag
+from .db import read_session
+from .models import MDTCase
+from .search import CASE_RANGE_ORDER, case_range_filter
+
+# Everything the details, edit and PDF views read from a case.
+CASE_AGGREGATE_OPTIONS = (
+    selectinload(MDTCase.patient),
+    selectinload(MDTCase.pathology_reports),
+    selectinload(MDTCase.imaging_reports),
+    selectinload(MDTCase.treatments),
+    selectinload(MDTCase.consensus),
+)
+
+class CaseAggregate:
+    """A fully loaded, detached MDTCase plus a digest of everything in it."""
+
+    def __init__(self, case: MDTCase, archived: bool = False):
+        self.case = case
+        self.archived = archived
+        self.digest = aggregate_digest(case)
+        self.loaded_at = time.monotonic()
+
+    def etag(self, view: str, daily: bool = False) -> str:
+        # HTML views show an age computed from today's date, so their tag rolls over at midnight
+        suffix = f"-{date.today():%Y%m%d}" if daily else ""
+        return f'"{view}-{self.digest}{suffix}"'
+
+def aggregate_digest(case: MDTCase) -> str:
+    parts = [
+        case.model_dump(),
+        case.patient.model_dump(),
+        [r.model_dump() for r in case.pathology_reports],
+        [r.model_dump() for r in case.imaging_reports],
+        [t.model_dump() for t in case.treatments],
+        case.consensus.model_dump() if case.consensus else None,
+    ]
+    return hashlib.sha256(json.dumps(parts, default=str, sort_keys=True).encode()).hexdigest()[:32]
+
+class CaseCache:
+    """In-process LRU of case aggregates with a TTL.
+
+    Writes in this process invalidate entries directly; the TTL bounds how long another
+    worker's write can go unseen.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[int, CaseAggregate] = OrderedDict()
+
+    def get(self, case_id: int) -> CaseAggregate | None:
+        entry = self._items.get(case_id)
+        if entry is None or time.monotonic() - entry.loaded_at > self.ttl:
+            self._items.pop(case_id, None)
+            self.misses += 1
+            return None
+        self._items.move_to_end(case_id)
+        self.hits += 1
+        return entry
+
+    def put(self, case_id: int, entry: CaseAggregate):
+        self._items[case_id] = entry
+        self._items.move_to_end(case_id)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def invalidate(self, *case_ids: int):
+        for case_id in case_ids:
+            self._items.pop(case_id, None)
+
+    def clear(self):
+        self._items.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._items), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+case_cache = CaseCache(settings.case_cache_size, settings.case_cache_ttl_seconds)
+
+async def load_case(case_id: int) -> CaseAggregate | None:
+    entry = case_cache.get(case_id)
+    if entry is not None:
+        return entry
+    async with read_session() as sess:
+        q = select(MDTCase).where(MDTCase.id == case_id).options(*CASE_AGGREGATE_OPTIONS)
+        case = (await sess.exec(q)).first()
+    archived = False
+    if not case:
+        case = await load_archived_case(case_id)
+        if not case:
+            return None
+        archived = True
+    entry = CaseAggregate(case, archived=archived)
+    case_cache.put(case_id, entry)
+    return entry
+
+async def load_cases_in_range(sd, ed) -> list[MDTCase]:
+    """Fully loaded cases for a meeting date range, in date-search order."""
+    async with read_session() as sess:
+        q = select(MDTCase).where(*case_range_filter(sd, ed)).order_by(*CASE_RANGE_ORDER).options(*CASE_AGGREGATE_OPTIONS)
+        return list((await sess.exec(q)).all())
+
+def invalidate_case(*case_ids: int):
+    case_cache.invalidate(*case_ids)
+
+def etag_matches(request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # a tag CompressionMiddleware extended with the encoding still names this version
+    return header.strip() == "*" or etag in [decoded_etag(t.strip()) for t in header.split(",")]
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from sqlmodel import select
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .config import settings
+from .db import read_session
+from .models import ChemoSchedule, ConfigVersion, ReportType, TreatmentConfig
+
+CONFIG_MODELS = {"report-types": ReportType, "treatments": TreatmentConfig, "chemo-schedules": ChemoSchedule}
+REPORT_KINDS = ("pathology", "imaging")
+
+@dataclass(frozen=True)
+class Option:
+    id: int
+    name: str
+
+@dataclass(frozen=True)
+class LookupConfig:
+    """Immutable snapshot of the admin lookup tables."""
+    version: int
+    pathology_report_types: tuple[Option, ...] = ()
+    imaging_report_types: tuple[Option, ...] = ()
+    treatment_types: tuple[Option, ...] = ()
+    chemo_schedules: tuple[Option, ...] = ()
+
+    def as_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "report_types": {
+                "pathology": [o.__dict__ for o in self.pathology_report_types],
+                "imaging": [o.__dict__ for o in self.imaging_report_types],
+            },
+            "treatments": [o.__dict__ for o in self.treatment_types],
+            "chemo_schedules": [o.__dict__ for o in self.chemo_schedules],
+        }
+
+async def _load(sess, version: int) -> LookupConfig:
+    report_types = (await sess.exec(select(ReportType).order_by(ReportType.name))).all()
+    treatments = (await sess.exec(select(TreatmentConfig).order_by(TreatmentConfig.allowed_type))).all()
+    schedules = (await sess.exec(select(ChemoSchedule).order_by(ChemoSchedule.id))).all()
+    return LookupConfig(
+        version=version,
+        pathology_report_types=tuple(Option(r.id, r.name) for r in report_types if r.kind == "pathology"),
+        imaging_report_types=tuple(Option(r.id, r.name) for r in report_types if r.kind == "imaging"),
+        treatment_types=tuple(Option(t.id, t.allowed_type) for t in treatments),
+        chemo_schedules=tuple(Option(c.id, c.name) for c in schedules),
+    )
+
+async def _current_version(sess) -> int:
+    return (await sess.exec(select(ConfigVersion.version).where(ConfigVersion.id == 1))).first() or 0
+
+class LookupCache:
+    """Process-wide snapshot of the lookup tables.
+
+    Reads are served from memory; at most once per check interval a single query compares
+    the version row, and the tables are reloaded only when it moved.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._config: LookupConfig | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> LookupConfig:
+        if self._config is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._config
+        async with self._lock:
+            if self._config is None or time.monotonic() - self._checked_at >= self.check_interval:
+                await self._refresh()
+        return self._config
+
+    async def _refresh(self):
+        async with read_session() as sess:
+            version = await _current_version(sess)
+            if self._config is None or version != self._config.version:
+                self._config = await _load(sess, version)
+                self.reloads += 1
+        self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def stats(self) -> dict:
+        return {"version": self._config.version if self._config else None, "reloads": self.reloads}
+
+lookup_cache = LookupCache(settings.config_check_interval_s)
+
+async def get_lookups() -> LookupConfig:
+    return await lookup_cache.get()
+
+async def ensure_config_version(sess):
+    # several workers start at once; only the first insert wins
+    await sess.execute(sqlite_insert(ConfigVersion).values(id=1, version=1, updated_at=datetime.utcnow()).on_conflict_do_nothing())
+
+async def bump_config_version(sess):
+    """Call inside the transaction of any lookup-table write, before commit."""
+    await sess.execute(update(ConfigVersion).where(ConfigVersion.id == 1).values(version=ConfigVersion.version + 1, updated_at=datetime.utcnow()))
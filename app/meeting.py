@@ -0,0 +1,105 @@
+import json
+from collections import Counter
+from datetime import date, datetime
+from pydantic import BaseModel
+from sqlmodel import select
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .db import async_session, read_session
+from .feed import publish_cases
+from .loader import invalidate_case
+from .models import Consensus, MDTCase, Patient
+from .schedule import adjust_schedule_counts, moved
+
+# SQLite caps bound parameters per statement; consensus rows bind 5 each
+_CHUNK = 500
+
+class ConsensusItem(BaseModel):
+    case_id: int
+    consensus_text: str
+    followups: list[str] = []
+
+class MeetingConsensus(BaseModel):
+    items: list[ConsensusItem]
+
+def _chunks(seq, size=_CHUNK):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+async def worksheet_rows(sess, day: date):
+    """Every case scheduled for `day` with its patient and consensus, in one query."""
+    q = (
+        select(MDTCase, Patient, Consensus)
+        .join(Patient, Patient.id == MDTCase.patient_id)
+        .outerjoin(Consensus, Consensus.mdt_case_id == MDTCase.id)
+        .where(MDTCase.scheduled_date == day)
+        .order_by(MDTCase.id)
+    )
+    return (await sess.exec(q)).all()
+
+def _same_text(a: str | None, b: str | None) -> bool:
+    # browsers post textarea line breaks as CRLF
+    return (a or "").replace("\r\n", "\n") == (b or "").replace("\r\n", "\n")
+
+async def changed_items(items: list[ConsensusItem]) -> list[ConsensusItem]:
+    """Drop items that match a Done case's stored consensus.
+
+    The worksheet posts every row it pre-filled; re-saving those would only bump
+    updated_at and push needless live updates.
+    """
+    stored = {}
+    async with read_session() as sess:
+        for chunk in _chunks([item.case_id for item in items]):
+            q = (
+                select(Consensus.mdt_case_id, Consensus.consensus_text, Consensus.followups_json)
+                .join(MDTCase, MDTCase.id == Consensus.mdt_case_id)
+                .where(Consensus.mdt_case_id.in_(chunk), MDTCase.status == "Done")
+            )
+            stored.update((cid, (text, followups)) for cid, text, followups in (await sess.exec(q)).all())
+
+    def unchanged(item: ConsensusItem) -> bool:
+        if item.case_id not in stored:
+            return False
+        text, followups = stored[item.case_id]
+        try:
+            return _same_text(text, item.consensus_text) and json.loads(followups or "[]") == item.followups
+        except ValueError:
+            return False
+    return [item for item in items if not unchanged(item)]
+
+async def save_consensus_batch(items: list[ConsensusItem]) -> list[dict]:
+    """Upsert consensus for many cases and mark them Done in a single write transaction."""
+    latest = {item.case_id: item for item in items}  # last entry per case wins
+    ids = list(latest)
+    now = datetime.utcnow()
+    async with async_session() as sess:
+        keys = {}
+        for chunk in _chunks(ids):
+            q = select(MDTCase.id, MDTCase.scheduled_date, MDTCase.status).where(MDTCase.id.in_(chunk))
+            keys.update((cid, (day, status)) for cid, day, status in (await sess.exec(q)).all())
+        found = set(keys)
+        rows = [
+            {"mdt_case_id": cid, "consensus_text": latest[cid].consensus_text,
+             "followups_json": json.dumps(latest[cid].followups), "created_at": now, "updated_at": now}
+            for cid in ids if cid in found
+        ]
+        for chunk in _chunks(rows):
+            stmt = sqlite_insert(Consensus).values(chunk)
+            await sess.execute(stmt.on_conflict_do_update(
+                index_elements=[Consensus.mdt_case_id],
+                set_={
+                    "consensus_text": stmt.excluded.consensus_text,
+                    "followups_json": stmt.excluded.followups_json,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            ))
+        for chunk in _chunks(sorted(found)):
+            await sess.execute(update(MDTCase).where(MDTCase.id.in_(chunk)).values(status="Done", updated_at=now))
+        deltas = Counter()
+        for day, status in keys.values():
+            deltas.update(moved((day, status), (day, "Done")))
+        await adjust_schedule_counts(sess, deltas)
+        await sess.commit()
+    invalidate_case(*found)
+    await publish_cases(*found)
+    return [{"case_id": cid, "result": "saved" if cid in found else "not_found"} for cid in ids]
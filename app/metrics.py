@@ -0,0 +1,205 @@
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from fastapi.templating import Jinja2Templates
+from sqlalchemy import event
+from .config import settings
+
+log = logging.getLogger("app.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# --- Per-request accounting ---
+class RequestStats:
+    __slots__ = ("sql_count", "sql_seconds", "template_seconds", "pdf_seconds", "statements", "streaming")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.pdf_seconds = 0.0
+        self.statements: Counter | None = Counter() if settings.perf_debug else None
+        self.streaming = False
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+def current_stats() -> RequestStats | None:
+    return _current.get()
+
+@contextmanager
+def timed(kind: str):
+    """Add the duration of the block to the current request's template/pdf time."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            attr = f"{kind}_seconds"
+            setattr(stats, attr, getattr(stats, attr) + time.perf_counter() - start)
+
+def install_sql_hooks(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.sql_count += 1
+        stats.sql_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements[statement] += 1
+
+# --- Aggregates ---
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        # buckets are stored cumulatively, as the exposition format expects
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+class Registry:
+    def __init__(self):
+        self._lock = Lock()
+        self.latency: dict[tuple, Histogram] = defaultdict(Histogram)
+        self.requests: Counter = Counter()
+        self.sql_statements: Counter = Counter()
+        self.sql_seconds: Counter = Counter()
+        self.template_seconds: Counter = Counter()
+        self.pdf_seconds: Counter = Counter()
+
+    def record(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            self.latency[key].observe(seconds)
+            self.requests[(method, route, str(status))] += 1
+            self.sql_statements[key] += stats.sql_count
+            self.sql_seconds[key] += stats.sql_seconds
+            self.template_seconds[key] += stats.template_seconds
+            self.pdf_seconds[key] += stats.pdf_seconds
+
+    def render(self, gauges: dict[str, float] | None = None) -> str:
+        lines = []
+
+        def labels(method, route, **extra):
+            pairs = {"method": method, "route": route, **extra}
+            return ",".join(f'{k}="{_escape(v)}"' for k, v in pairs.items())
+
+        with self._lock:
+            lines += ["# HELP mdt_http_request_duration_seconds Request wall time by route.",
+                      "# TYPE mdt_http_request_duration_seconds histogram"]
+            for (method, route), h in sorted(self.latency.items()):
+                for bound, n in zip(LATENCY_BUCKETS, h.buckets):
+                    lines.append(f'mdt_http_request_duration_seconds_bucket{{{labels(method, route, le=str(bound))}}} {n}')
+                lines.append(f'mdt_http_request_duration_seconds_bucket{{{labels(method, route, le="+Inf")}}} {h.count}')
+                lines.append(f"mdt_http_request_duration_seconds_sum{{{labels(method, route)}}} {h.sum:.6f}")
+                lines.append(f"mdt_http_request_duration_seconds_count{{{labels(method, route)}}} {h.count}")
+
+            lines += ["# HELP mdt_http_requests_total Requests by route and status.", "# TYPE mdt_http_requests_total counter"]
+            for (method, route, status), n in sorted(self.requests.items()):
+                lines.append(f"mdt_http_requests_total{{{labels(method, route, status=status)}}} {n}")
+
+            for name, counter, help_text in (
+                ("mdt_http_sql_statements_total", self.sql_statements, "SQL statements issued while serving the route."),
+                ("mdt_http_sql_seconds_total", self.sql_seconds, "Time spent in SQL while serving the route."),
+                ("mdt_http_template_seconds_total", self.template_seconds, "Time spent rendering templates."),
+                ("mdt_http_pdf_seconds_total", self.pdf_seconds, "Time spent waiting on PDF rendering."),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (method, route), v in sorted(counter.items()):
+                    lines.append(f"{name}{{{labels(method, route)}}} {v:.6f}" if isinstance(v, float) else f"{name}{{{labels(method, route)}}} {v}")
+
+        for name, value in sorted((gauges or {}).items()):
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+registry = Registry()
+
+# --- ASGI middleware ---
+_WS = re.compile(r"\s+")
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stats.streaming = any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message.get("headers", []))
+                if settings.perf_debug:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"server-timing", _server_timing(stats, start).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = scope.get("route")
+            # unmatched paths are folded together so scanners can't blow up label cardinality
+            route_path = getattr(route, "path", None) or "<unmatched>"
+            registry.record(scope["method"], route_path, status, elapsed, stats)
+            self._log(scope, route_path, status, elapsed, stats)
+
+    def _log(self, scope, route_path, status, elapsed, stats):
+        # event streams stay open by design
+        if elapsed * 1000 >= settings.slow_request_ms and not stats.streaming:
+            log.warning(
+                "slow request %s %s -> %s in %.1f ms (sql: %d stmts / %.1f ms, template %.1f ms, pdf %.1f ms)",
+                scope["method"], scope["path"], status, elapsed * 1000,
+                stats.sql_count, stats.sql_seconds * 1000, stats.template_seconds * 1000, stats.pdf_seconds * 1000,
+            )
+        if stats.statements:
+            for statement, n in stats.statements.most_common():
+                if n < settings.n_plus_one_threshold:
+                    break
+                log.warning(
+                    "possible N+1 on %s %s: statement ran %d times: %s",
+                    scope["method"], route_path, n, _WS.sub(" ", statement)[:300],
+                )
+
+def _server_timing(stats: RequestStats, start: float) -> str:
+    return (
+        f"db;dur={stats.sql_seconds * 1000:.1f};desc=\"{stats.sql_count} stmts\", "
+        f"tpl;dur={stats.template_seconds * 1000:.1f}, "
+        f"pdf;dur={stats.pdf_seconds * 1000:.1f}, "
+        f"app;dur={(time.perf_counter() - start) * 1000:.1f}"
+    )
+
+# --- Templates ---
+class TimedTemplates(Jinja2Templates):
+    def TemplateResponse(self, *args, **kwargs):
+        # the template is rendered inside the response constructor
+        with timed("template"):
+            return super().TemplateResponse(*args, **kwargs)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from datetime import date, datetime
 from typing import Optional, List, Literal
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 # --- Auth / Users ---
@@ -29,7 +30,18 @@ class Patient(SQLModel, table=True):
 
     cases: List["MDTCase"] = Relationship(back_populates="patient")
 
+class PatientPhone(SQLModel, table=True):
+    # normalized lookup copy of phone_primary and additional_phones_json, rebuilt on every patient write
+    id: Optional[int] = Field(default=None, primary_key=True)
+    patient_id: int = Field(foreign_key="patient.id", index=True)
+    phone: str = Field(index=True)  # digits only, last 10
+    phone_reversed: str = Field(index=True)  # for "ends with" lookups
+
+# Cases and their children are AUTOINCREMENT: archiving deletes the newest rows too, and
+# a reused id would make a new case shadow (and later overwrite) an archived one.
 class MDTCase(SQLModel, table=True):
+    __table_args__ = (Index("ix_mdtcase_schedule", "scheduled_date", "status", "id"), {"sqlite_autoincrement": True})
+
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_id: int = Field(foreign_key="patient.id")
     clinical_history: Optional[str] = None
@@ -48,22 +60,34 @@ class MDTCase(SQLModel, table=True):
     treatments: List["TreatmentHistory"] = Relationship(back_populates="mdt_case")
     consensus: Optional["Consensus"] = Relationship(back_populates="mdt_case")
 
+class ScheduleSummary(SQLModel, table=True):
+    # per (scheduled_date, status) case counts, maintained alongside every case write; NULL date = unscheduled
+    __table_args__ = (Index("ix_schedulesummary_key", "scheduled_date", "status", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    scheduled_date: Optional[date] = None
+    status: str
+    count: int = 0
+
 class ReportBase(SQLModel):
     date_of_report: date
     report_type: str
     investigation_details: Optional[str] = None
 
 class PathologyReport(ReportBase, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}
     id: Optional[int] = Field(default=None, primary_key=True)
     mdt_case_id: int = Field(foreign_key="mdtcase.id")
     mdt_case: MDTCase = Relationship(back_populates="pathology_reports")
 
 class ImagingReport(ReportBase, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}
     id: Optional[int] = Field(default=None, primary_key=True)
     mdt_case_id: int = Field(foreign_key="mdtcase.id")
     mdt_case: MDTCase = Relationship(back_populates="imaging_reports")
 
 class TreatmentHistory(SQLModel, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}
     id: Optional[int] = Field(default=None, primary_key=True)
     mdt_case_id: int = Field(foreign_key="mdtcase.id")
     treatment_type: str
@@ -92,6 +116,7 @@ class TreatmentHistory(SQLModel, table=True):
     mdt_case: MDTCase = Relationship(back_populates="treatments")
 
 class Consensus(SQLModel, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}
     id: Optional[int] = Field(default=None, primary_key=True)
     mdt_case_id: int = Field(foreign_key="mdtcase.id", unique=True)
     consensus_text: Optional[str] = None
@@ -114,3 +139,30 @@ class TreatmentConfig(SQLModel, table=True):
 class ChemoSchedule(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str  # e.g., Daily, Weekly, 2-weekly, 3-weekly
+
+class ConfigVersion(SQLModel, table=True):
+    # single row (id=1); every admin config write bumps it so other workers know to reload
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+# --- Background jobs ---
+class Job(SQLModel, table=True):
+    __table_args__ = (Index("ix_job_queue", "status", "run_after", "id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str
+    params_json: str = "{}"
+    status: str = "queued"  # queued, running, done, failed
+    attempts: int = 0
+    max_attempts: int = 3
+    run_after: datetime = Field(default_factory=datetime.utcnow)
+    locked_by: Optional[str] = None
+    locked_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result_path: Optional[str] = None  # file under settings.job_results_dir
+    result_media_type: Optional[str] = None
+    result_filename: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
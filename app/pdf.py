@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import tempfile
+import zipfile
+from html import escape
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from .config import settings
+from .metrics import timed
+from .startup import lazy_import
+
+# --- HTML ---
+_STYLE = """
+    @page {{ size: A4; margin: {top}mm {right}mm {bottom}mm {left}mm; }}
+    body {{ font-family: sans-serif; }}
+    h1 {{ margin-bottom: 0; }}
+    .muted {{ color: #666; }}
+    .section {{ margin-top: 12px; }}
+    .case + .case {{ page-break-before: always; }}
+    table {{ width: 100%; border-collapse: collapse; }}
+    td, th {{ border: 1px solid #ddd; padding: 6px; vertical-align: top; }}
+    .badge {{ padding: 2px 6px; border-radius: 4px; background: #eee; }}
+"""
+
+def _e(value, default="-") -> str:
+    return escape(str(value)) if value not in (None, "") else default
+
+def _case_body(case) -> str:
+    p = case.patient
+    report_rows = lambda reports: "".join(
+        f"<tr><td>{_e(r.date_of_report)}</td><td>{_e(r.report_type)}</td><td>{_e(r.investigation_details)}</td></tr>"
+        for r in reports
+    )
+    treatment_rows = "".join(
+        f"<tr><td>{_e(t.treatment_type)}</td><td>{_e(t.chemo_protocol or t.radiation_dose or t.surgery_done or t.other_notes)}</td></tr>"
+        for t in case.treatments
+    )
+    consensus = case.consensus
+    return f"""
+    <div class='case'>
+      <h1>MDT Case #{case.id}</h1>
+      <div class='muted'>Patient: {_e(p.name)} — HN {_e(p.hospital_number)}</div>
+      <div class='muted'>DOB {_e(p.dob)} — Status <span class='badge'>{_e(case.status)}</span></div>
+
+      <div class='section'><strong>Clinical History</strong><br/>{_e(case.clinical_history)}</div>
+      <div class='section'><strong>Provisional Diagnosis</strong><br/>{_e(case.provisional_diagnosis)}</div>
+      <div class='section'><strong>Discussion For</strong><br/>{_e(case.discussion_for)}</div>
+      <div class='section'><strong>Scheduled</strong><br/>{_e(case.scheduled_reason)} ({_e(case.scheduled_date, "—")})</div>
+
+      <div class='section'><strong>Pathology Reports</strong>
+        <table>
+          <tr><th>Date</th><th>Type</th><th>Investigation Details</th></tr>
+          {report_rows(case.pathology_reports)}
+        </table>
+      </div>
+
+      <div class='section'><strong>Imaging Reports</strong>
+        <table>
+          <tr><th>Date</th><th>Type</th><th>Investigation Details</th></tr>
+          {report_rows(case.imaging_reports)}
+        </table>
+      </div>
+
+      <div class='section'><strong>Treatment History</strong>
+        <table>
+          <tr><th>Type</th><th>Key Fields</th></tr>
+          {treatment_rows}
+        </table>
+      </div>
+
+      <div class='section'><strong>Consensus & Follow-ups</strong><br/>{_e(consensus and consensus.consensus_text)}
+        <div>Follow-ups: {_e(consensus and consensus.followups_json, "[]")}</div>
+      </div>
+    </div>
+    """
+
+def render_cases_html(cases) -> str:
+    style = _STYLE.format(
+        top=settings.pdf_margin_top_mm,
+        right=settings.pdf_margin_right_mm,
+        bottom=settings.pdf_margin_bottom_mm,
+        left=settings.pdf_margin_left_mm,
+    )
+    body = "".join(_case_body(c) for c in cases)
+    return f"<html><head><meta charset='utf-8'/><style>{style}</style></head><body>{body}</body></html>"
+
+def render_case_html(case) -> str:
+    return render_cases_html([case])
+
+# --- Worker pool ---
+_pool: ProcessPoolExecutor | None = None
+
+def _write_pdf(html: str) -> bytes:
+    # runs in a worker process; the parent never pays for importing WeasyPrint
+    return lazy_import("weasyprint").HTML(string=html).write_pdf()
+
+def _write_pdf_file(html: str, path: str) -> str:
+    lazy_import("weasyprint").HTML(string=html).write_pdf(target=path)
+    return path
+
+def _warm_worker():
+    # import up front so the first PDF a worker renders isn't also paying for the import
+    try:
+        lazy_import("weasyprint")
+    except Exception:
+        pass  # surfaces on the first render instead
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.pdf_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+        )
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _drop_broken_pool(broken: ProcessPoolExecutor):
+    global _pool
+    # concurrent renders all see the same broken pool; only the first one replaces it
+    if _pool is broken:
+        _pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+async def _run_in_pool(fn, *args):
+    # a worker killed mid-render (OOM, segfault in a native library) breaks the whole pool
+    # for good; start a fresh one and retry once rather than failing every later PDF
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    try:
+        return await loop.run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        _drop_broken_pool(pool)
+        return await loop.run_in_executor(get_pool(), fn, *args)
+
+# --- Finished PDF cache ---
+class PDFCache:
+    """LRU of rendered PDFs, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            pdf = self._items.get(key)
+            if pdf is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return pdf
+
+    def put(self, key: str, pdf: bytes):
+        if len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = pdf
+            self.size += len(pdf)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+pdf_cache = PDFCache(settings.pdf_cache_max_mb * 1024 * 1024)
+
+def case_cache_key(case, html: str) -> str:
+    # Reports and treatments carry no updated_at, so their contribution is taken from
+    # the rendered HTML; the case/consensus stamps catch edits that don't change the text.
+    h = hashlib.sha256()
+    h.update(str(case.updated_at).encode())
+    h.update(str(case.consensus.updated_at if case.consensus else "").encode())
+    for r in case.pathology_reports + case.imaging_reports:
+        h.update(f"r{r.id}".encode())
+    for t in case.treatments:
+        h.update(f"t{t.id}".encode())
+    h.update(html.encode())
+    return f"{case.id}:{h.hexdigest()}"
+
+async def render_pdf(html: str) -> bytes:
+    with timed("pdf"):
+        return await _run_in_pool(_write_pdf, html)
+
+async def render_pdf_cached(key: str, html: str) -> bytes:
+    pdf = pdf_cache.get(key)
+    if pdf is None:
+        pdf = await render_pdf(html)
+        pdf_cache.put(key, pdf)
+    return pdf
+
+async def render_pdf_to_file(html: str) -> str:
+    """Render into a temp file so large documents never pass through the parent's memory."""
+    fd, path = tempfile.mkstemp(prefix="mdt-", suffix=".pdf")
+    os.close(fd)
+    try:
+        with timed("pdf"):
+            await _run_in_pool(_write_pdf_file, html, path)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+async def case_pdf(case) -> bytes:
+    html = render_case_html(case)
+    return await render_pdf_cached(case_cache_key(case, html), html)
+
+async def iter_case_pdfs(cases):
+    """Yield (case, pdf) pairs in completion order, rendering across the pool.
+
+    The result queue is bounded so a slow consumer holds back rendering instead of
+    piling finished PDFs up in memory.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.pdf_workers)
+    sem = asyncio.Semaphore(settings.pdf_workers)
+
+    async def one(case):
+        async with sem:
+            try:
+                item = (case, await case_pdf(case))
+            except Exception as exc:
+                item = (case, exc)
+            await queue.put(item)
+
+    tasks = [asyncio.create_task(one(c)) for c in cases]
+    try:
+        for _ in tasks:
+            case, result = await queue.get()
+            if isinstance(result, Exception):
+                raise result
+            yield case, result
+    finally:
+        for t in tasks:
+            t.cancel()
+
+class _ZipSink:
+    # Write-only target for ZipFile; the zip is drained after every member so nothing accumulates.
+    def __init__(self):
+        self._buf = bytearray()
+
+    def write(self, data) -> int:
+        self._buf += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+def pack_member_name(case) -> str:
+    hn = re.sub(r"[^A-Za-z0-9_-]", "_", case.patient.hospital_number)
+    return f"{case.scheduled_date or 'unscheduled'}_{hn}_case{case.id}.pdf"
+
+async def stream_case_zip(cases):
+    sink = _ZipSink()
+    zf = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED)
+    async for case, pdf in iter_case_pdfs(cases):
+        zf.writestr(pack_member_name(case), pdf)
+        yield sink.drain()
+    zf.close()
+    yield sink.drain()
@@ -0,0 +1,75 @@
+from collections import Counter
+from datetime import date
+from sqlmodel import SQLModel, select
+from sqlalchemy import and_, event, or_, update
+from .models import ScheduleSummary
+
+def schedule_key(case) -> tuple[date | None, str]:
+    return case.scheduled_date, case.status
+
+async def adjust_schedule_counts(sess, deltas: Counter):
+    """Apply {(scheduled_date, status): +/-n} to the summary inside the caller's transaction."""
+    table = ScheduleSummary.__table__
+    for (day, status), delta in deltas.items():
+        if not delta:
+            continue
+        # unique indexes don't treat NULLs as equal, so no ON CONFLICT here: IS matches the unscheduled row too
+        res = await sess.execute(
+            update(table)
+            .where(table.c.scheduled_date.is_(day), table.c.status == status)
+            .values(count=table.c.count + delta)
+        )
+        if res.rowcount == 0:
+            await sess.execute(table.insert().values(scheduled_date=day, status=status, count=delta))
+
+def moved(old: tuple, new: tuple) -> Counter:
+    return Counter() if old == new else Counter({old: -1, new: 1})
+
+def _has_archive(sync_conn) -> bool:
+    if "archive" not in {row[1] for row in sync_conn.exec_driver_sql("PRAGMA database_list")}:
+        return False
+    return sync_conn.exec_driver_sql("SELECT 1 FROM archive.sqlite_master WHERE name = 'mdtcase'").first() is not None
+
+def rebuild_schedule_summary(sync_conn) -> int:
+    # archived cases still happened: they stay in the counts
+    source = "SELECT scheduled_date, status FROM main.mdtcase"
+    if _has_archive(sync_conn):
+        source += " UNION ALL SELECT scheduled_date, status FROM archive.mdtcase"
+    sync_conn.exec_driver_sql("DELETE FROM schedulesummary")
+    sync_conn.exec_driver_sql(
+        "INSERT INTO schedulesummary (scheduled_date, status, count) "
+        f"SELECT scheduled_date, status, count(*) FROM ({source}) GROUP BY scheduled_date, status"
+    )
+    return sync_conn.exec_driver_sql("SELECT coalesce(sum(count), 0) FROM schedulesummary").scalar()
+
+def _summary_missing(sync_conn) -> bool:
+    # an empty summary over a non-empty mdtcase was never counted (e.g. cases bulk-loaded by a
+    # tool that doesn't maintain it); a real summary has a row for every (date, status) in use
+    if sync_conn.exec_driver_sql("SELECT 1 FROM schedulesummary LIMIT 1").first() is not None:
+        return False
+    return sync_conn.exec_driver_sql("SELECT 1 FROM main.mdtcase LIMIT 1").first() is not None
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _backfill_schedule_summary(target, connection, **kw):
+    # runs once mdtcase is guaranteed to exist; adjust_schedule_counts keeps it current afterwards
+    if _summary_missing(connection):
+        rebuild_schedule_summary(connection)
+
+async def schedule_calendar(sess, start: date | None = None, end: date | None = None) -> dict:
+    """Case counts per MDT date plus the unscheduled total, read from the summary table only."""
+    col = ScheduleSummary.scheduled_date
+    in_range = [col >= start] if start else []
+    in_range += [col <= end] if end else []
+    q = (
+        select(ScheduleSummary)
+        .where(ScheduleSummary.count != 0, or_(col.is_(None), and_(col.is_not(None), *in_range)))
+        .order_by(col)
+    )
+    days: dict[date, dict[str, int]] = {}
+    unscheduled = 0
+    for row in (await sess.exec(q)).all():
+        if row.scheduled_date is None:
+            unscheduled += row.count
+        else:
+            days.setdefault(row.scheduled_date, {"Pending": 0, "Done": 0})[row.status] = row.count
+    return {"days": days, "unscheduled": unscheduled}
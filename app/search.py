@@ -0,0 +1,265 @@
+import json
+import re
+from datetime import date
+from markupsafe import Markup, escape
+from sqlalchemy import delete, event, insert, text, tuple_
+from sqlmodel import SQLModel, select
+from sqlalchemy.orm import selectinload
+from .models import MDTCase, Patient, PatientPhone
+from .config import settings
+from .db import register_schema_ddl
+
+CASE_STATUSES = ("Pending", "Done")
+
+# --- Date-range search ---
+# Pages are ordered by (scheduled_date, status, id), which is exactly ix_mdtcase_schedule,
+# so a page is an index range scan regardless of how deep into the range it starts.
+def case_range_filter(sd: date | None, ed: date | None, status: str | None = None, table=None) -> list:
+    cols = MDTCase if table is None else table.c  # table: the archive's copy of mdtcase
+    clauses = []
+    if sd:
+        clauses.append(cols.scheduled_date >= sd)
+    if ed:
+        clauses.append(cols.scheduled_date <= ed)
+    if status:
+        clauses.append(cols.status == status)
+    return clauses
+
+CASE_RANGE_ORDER = (MDTCase.scheduled_date, MDTCase.status, MDTCase.id)
+
+def encode_cursor(case: MDTCase) -> str:
+    return f"{case.scheduled_date.isoformat()},{case.status},{case.id}"
+
+def decode_cursor(cursor: str) -> tuple[date, str, int] | None:
+    try:
+        d, status, case_id = cursor.split(",")
+        return date.fromisoformat(d), status, int(case_id)
+    except ValueError:
+        return None
+
+def clamp_page_size(limit: int | None) -> int:
+    if not limit or limit < 1:
+        return settings.search_page_size
+    return min(limit, settings.search_max_page_size)
+
+def clamp_patient_limit(limit: int | None) -> int:
+    if not limit or limit < 1:
+        return settings.patient_search_limit
+    return min(limit, settings.patient_search_max_limit)
+
+async def search_cases_page(sess, sd: date, ed: date, status: str | None = None, after: str | None = None, limit: int | None = None):
+    limit = clamp_page_size(limit)
+    q = select(MDTCase).where(*case_range_filter(sd, ed, status))
+    if after:
+        key = decode_cursor(after)
+        if key:
+            q = q.where(tuple_(*CASE_RANGE_ORDER) > tuple_(*key))
+    q = q.order_by(*CASE_RANGE_ORDER).limit(limit + 1).options(selectinload(MDTCase.patient))
+    items = list((await sess.exec(q)).all())
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+def case_summary(case: MDTCase) -> dict:
+    return {
+        "id": case.id,
+        "patient": case.patient.name,
+        "hospital_number": case.patient.hospital_number,
+        "scheduled_date": case.scheduled_date.isoformat() if case.scheduled_date else None,
+        "status": case.status,
+    }
+
+# --- Full-text search (SQLite FTS5) ---
+# case_fts rows share their rowid with mdtcase.id; triggers keep them in step with
+# mdtcase and consensus writes, including bulk statements that bypass the ORM.
+CASE_FTS_COLUMNS = ("clinical_history", "provisional_diagnosis", "discussion_for", "consensus_text")
+
+CASE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS case_fts USING fts5(
+        clinical_history, provisional_diagnosis, discussion_for, consensus_text,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS mdtcase_fts_ai AFTER INSERT ON mdtcase BEGIN
+        INSERT INTO case_fts(rowid, clinical_history, provisional_diagnosis, discussion_for, consensus_text)
+        VALUES (new.id, new.clinical_history, new.provisional_diagnosis, new.discussion_for,
+                (SELECT consensus_text FROM consensus WHERE mdt_case_id = new.id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS mdtcase_fts_au AFTER UPDATE OF clinical_history, provisional_diagnosis, discussion_for ON mdtcase BEGIN
+        UPDATE case_fts SET clinical_history = new.clinical_history, provisional_diagnosis = new.provisional_diagnosis,
+            discussion_for = new.discussion_for
+        WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS mdtcase_fts_ad AFTER DELETE ON mdtcase BEGIN
+        DELETE FROM case_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS consensus_fts_ai AFTER INSERT ON consensus BEGIN
+        UPDATE case_fts SET consensus_text = new.consensus_text WHERE rowid = new.mdt_case_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS consensus_fts_au AFTER UPDATE OF consensus_text ON consensus BEGIN
+        UPDATE case_fts SET consensus_text = new.consensus_text WHERE rowid = new.mdt_case_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS consensus_fts_ad AFTER DELETE ON consensus BEGIN
+        UPDATE case_fts SET consensus_text = NULL WHERE rowid = old.mdt_case_id;
+    END""",
+]
+
+def rebuild_case_fts(sync_conn) -> int:
+    sync_conn.exec_driver_sql("DELETE FROM case_fts")
+    sync_conn.exec_driver_sql(
+        "INSERT INTO case_fts(rowid, clinical_history, provisional_diagnosis, discussion_for, consensus_text) "
+        "SELECT m.id, m.clinical_history, m.provisional_diagnosis, m.discussion_for, c.consensus_text "
+        "FROM mdtcase m LEFT JOIN consensus c ON c.mdt_case_id = m.id"
+    )
+    return sync_conn.exec_driver_sql("SELECT count(*) FROM case_fts").scalar()
+
+register_schema_ddl(*CASE_FTS_DDL)
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _install_case_fts(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    existed = connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'case_fts'").first()
+    for stmt in CASE_FTS_DDL:
+        connection.exec_driver_sql(stmt)
+    if not existed:
+        # first start on an existing database: backfill once, triggers take over from here
+        rebuild_case_fts(connection)
+
+_SNIPPET_OPEN, _SNIPPET_CLOSE = "\x02", "\x03"
+
+def fts_query(q: str) -> str:
+    # Quote every term so user input can never be parsed as FTS5 syntax; a trailing * keeps prefix search.
+    terms = []
+    for word in q.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def highlight(snippet: str | None) -> Markup:
+    if not snippet:
+        return Markup("")
+    return escape(snippet).replace(_SNIPPET_OPEN, Markup("<mark>")).replace(_SNIPPET_CLOSE, Markup("</mark>"))
+
+async def search_cases_text(sess, q: str, field: str | None = None, limit: int | None = None) -> list[tuple[MDTCase, Markup]]:
+    match = fts_query(q)
+    if not match:
+        return []
+    if field:
+        match = f"{{{field}}} : ({match})"
+    stmt = text(
+        f"SELECT rowid, snippet(case_fts, -1, '{_SNIPPET_OPEN}', '{_SNIPPET_CLOSE}', '…', 16) "
+        "FROM case_fts WHERE case_fts MATCH :match "
+        # weight provisional diagnosis and consensus above free-text history
+        "ORDER BY bm25(case_fts, 1.0, 3.0, 1.0, 2.0) LIMIT :limit"
+    )
+    hits = (await sess.execute(stmt, {"match": match, "limit": clamp_page_size(limit)})).all()
+    if not hits:
+        return []
+    ids = [h[0] for h in hits]
+    res = await sess.exec(select(MDTCase).where(MDTCase.id.in_(ids)).options(selectinload(MDTCase.patient)))
+    by_id = {c.id: c for c in res.all()}
+    return [(by_id[i], highlight(snip)) for i, snip in hits if i in by_id]
+
+# --- Patient lookup ---
+# Names are matched through an FTS5 trigram index (any 3+ character substring);
+# phones through PatientPhone, which holds every number in normalized form.
+PATIENT_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS patient_name_fts USING fts5(name, tokenize = 'trigram')",
+    """CREATE TRIGGER IF NOT EXISTS patient_name_fts_ai AFTER INSERT ON patient BEGIN
+        INSERT INTO patient_name_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS patient_name_fts_au AFTER UPDATE OF name ON patient BEGIN
+        UPDATE patient_name_fts SET name = new.name WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS patient_name_fts_ad AFTER DELETE ON patient BEGIN
+        DELETE FROM patient_name_fts WHERE rowid = old.id;
+    END""",
+]
+
+PHONE_DIGITS = 10
+
+def normalize_phone(raw) -> str:
+    digits = re.sub(r"\D", "", str(raw or ""))
+    return digits[-PHONE_DIGITS:]
+
+def _additional_phones(raw: str | None) -> list:
+    if not raw:
+        return []
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return raw.split(",")
+    return value if isinstance(value, list) else [value]
+
+def patient_phone_rows(patient_id: int, phone_primary: str | None, additional_phones_json: str | None) -> list[dict]:
+    rows, seen = [], set()
+    for raw in [phone_primary, *_additional_phones(additional_phones_json)]:
+        phone = normalize_phone(raw)
+        if len(phone) >= 3 and phone not in seen:
+            seen.add(phone)
+            rows.append({"patient_id": patient_id, "phone": phone, "phone_reversed": phone[::-1]})
+    return rows
+
+def patient_phones(patient: Patient) -> list[PatientPhone]:
+    return [PatientPhone(**r) for r in patient_phone_rows(patient.id, patient.phone_primary, patient.additional_phones_json)]
+
+def rebuild_patient_index(sync_conn, batch_size: int = 5000) -> int:
+    sync_conn.exec_driver_sql("DELETE FROM patient_name_fts")
+    sync_conn.exec_driver_sql("INSERT INTO patient_name_fts(rowid, name) SELECT id, name FROM patient")
+    sync_conn.execute(delete(PatientPhone))
+    q = select(Patient.id, Patient.phone_primary, Patient.additional_phones_json).execution_options(yield_per=batch_size)
+    n = 0
+    for chunk in sync_conn.execute(q).partitions():
+        rows = [r for p in chunk for r in patient_phone_rows(*p)]
+        if rows:
+            sync_conn.execute(insert(PatientPhone), rows)
+        n += len(chunk)
+    return n
+
+register_schema_ddl(*PATIENT_FTS_DDL)
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _install_patient_fts(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    existed = connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'patient_name_fts'").first()
+    for stmt in PATIENT_FTS_DDL:
+        connection.exec_driver_sql(stmt)
+    if not existed:
+        rebuild_patient_index(connection)
+
+def _prefix_range(column, prefix: str) -> list:
+    # "column LIKE 'abc%'" can't use a BINARY index in SQLite; an explicit range can.
+    return [column >= prefix, column < prefix + "\uffff"]
+
+async def search_patients(sess, q: str, limit: int | None = None) -> list[Patient]:
+    q = q.strip()
+    limit = clamp_patient_limit(limit)
+    ids: list[int] = []
+
+    def add(found):
+        for i in found:
+            if i not in ids:
+                ids.append(i)
+
+    if len(q) >= 2:
+        add((await sess.exec(select(Patient.id).where(*_prefix_range(Patient.hospital_number, q)).limit(limit))).all())
+    # "+91 98765 ..." - a separated country code is not part of the stored number
+    digits = re.sub(r"\D", "", re.sub(r"^\+\d{1,3}[\s-]+", "", q))
+    if len(digits) >= 3 and not re.search(r"[^\d\s()+-]", q):
+        digits = digits[-PHONE_DIGITS:]
+        add((await sess.exec(select(PatientPhone.patient_id).where(*_prefix_range(PatientPhone.phone, digits)).limit(limit))).all())
+        add((await sess.exec(select(PatientPhone.patient_id).where(*_prefix_range(PatientPhone.phone_reversed, digits[::-1])).limit(limit))).all())
+    else:
+        terms = [w.replace('"', '""') for w in q.split() if len(w) >= 3]
+        if terms:
+            match = " ".join(f'"{t}"' for t in terms)
+            stmt = text("SELECT rowid FROM patient_name_fts WHERE patient_name_fts MATCH :match ORDER BY rank LIMIT :limit")
+            add((await sess.execute(stmt, {"match": match, "limit": limit})).scalars().all())
+
+    ids = ids[:limit]
+    if not ids:
+        return []
+    by_id = {p.id: p for p in (await sess.exec(select(Patient).where(Patient.id.in_(ids)))).all()}
+    return [by_id[i] for i in ids if i in by_id]
@@ -1,6 +1,11 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from itsdangerous import URLSafeSerializer, BadSignature
 from fastapi import Request, Response
 from .config import settings
+from .startup import lazy_import
 
 SESSION_COOKIE = "mdt_session"
 serializer = URLSafeSerializer(settings.secret_key, salt="session")
@@ -8,14 +13,81 @@ serializer = URLSafeSerializer(settings.secret_key, salt="session")
 def set_session(response: Response, data: dict):
     response.set_cookie(SESSION_COOKIE, serializer.dumps(data), httponly=True, samesite="lax")
 
-def get_session(request: Request) -> dict | None:
-    cookie = request.cookies.get(SESSION_COOKIE)
-    if not cookie:
-        return None
+@lru_cache(maxsize=settings.session_cache_size)
+def _decode_session(cookie: str) -> dict | None:
     try:
         return serializer.loads(cookie)
     except BadSignature:
         return None
 
+def get_session(request: Request) -> dict | None:
+    cookie = request.cookies.get(SESSION_COOKIE)
+    if not cookie:
+        return None
+    data = _decode_session(cookie)
+    # callers may mutate the dict; keep the cached copy clean
+    return dict(data) if data is not None else None
+
 def clear_session(response: Response):
     response.delete_cookie(SESSION_COOKIE)
+
+# --- Passwords ---
+# bcrypt costs ~250 ms of CPU and releases the GIL, so it runs on a small thread pool.
+# Jobs beyond the workers plus queue, or beyond the optional per-IP cap, are refused
+# instead of piling up behind a burst of logins.
+class PasswordBusy(Exception):
+    pass
+
+_executor: ThreadPoolExecutor | None = None
+_in_flight = 0
+_per_ip: Counter = Counter()
+
+def _hasher():
+    bcrypt = lazy_import("passlib.hash").bcrypt
+    return bcrypt.using(rounds=settings.bcrypt_rounds)
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.password_workers, thread_name_prefix="password")
+    return _executor
+
+def shutdown_password_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def _run(fn, *args, client: str | None = None):
+    global _in_flight
+    if _in_flight >= settings.password_workers + settings.password_queue_size:
+        raise PasswordBusy("password queue full")
+    if settings.password_per_ip and client and _per_ip[client] >= settings.password_per_ip:
+        raise PasswordBusy("too many concurrent attempts")
+    _in_flight += 1
+    if client:
+        _per_ip[client] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _in_flight -= 1
+        if client:
+            _per_ip[client] -= 1
+            if not _per_ip[client]:
+                del _per_ip[client]
+
+def _verify(password: str, password_hash: str) -> tuple[bool, bool]:
+    hasher = _hasher()
+    if not hasher.verify(password, password_hash):
+        return False, False
+    return True, hasher.needs_update(password_hash)
+
+async def verify_password(password: str, password_hash: str, client: str | None = None) -> tuple[bool, bool]:
+    """Return (valid, needs_rehash)."""
+    return await _run(_verify, password, password_hash, client=client)
+
+async def hash_password(password: str) -> str:
+    return await _run(_hasher().hash, password)
+
+def password_stats() -> dict:
+    return {"in_flight": _in_flight, "clients": len(_per_ip)}
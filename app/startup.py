@@ -0,0 +1,60 @@
+import importlib
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from .config import settings
+
+log = logging.getLogger("app.startup")
+
+# imported first by app.main, so this is roughly when the worker started loading the app
+_T0 = time.perf_counter()
+
+class StartupBudget:
+    """Wall-clock of each cold-start phase, logged once and checked against STARTUP_BUDGET_MS."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.imports: dict[str, float] = {}
+        self._last = _T0
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        self._last = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name)
+
+    def report(self):
+        total = sum(self.phases.values())
+        detail = ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in self.phases.items())
+        if total * 1000 > settings.startup_budget_ms:
+            log.warning("startup took %.0f ms, over the %d ms budget (%s)", total * 1000, settings.startup_budget_ms, detail)
+        else:
+            log.info("startup took %.0f ms (%s)", total * 1000, detail)
+
+    def stats(self) -> dict:
+        return {
+            "total_ms": round(sum(self.phases.values()) * 1000, 1),
+            "phases_ms": {k: round(v * 1000, 1) for k, v in self.phases.items()},
+            "lazy_imports_ms": {k: round(v * 1000, 1) for k, v in self.imports.items()},
+        }
+
+budget = StartupBudget()
+
+def lazy_import(name: str):
+    """Import a heavy module on first use and record what it cost."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    budget.imports[name] = elapsed = time.perf_counter() - start
+    log.info("lazy import of %s took %.0f ms", name, elapsed * 1000)
+    return module
@@ -0,0 +1,39 @@
+// Keeps the search-by-date table current from the /search/date/events change feed.
+(function () {
+  var table = document.getElementById("case-table");
+  if (!table || !window.EventSource) return;
+  var d = table.dataset;
+  var body = table.tBodies[0];
+  var source = new EventSource("/search/date/events?start=" + encodeURIComponent(d.start) + "&end=" + encodeURIComponent(d.end));
+
+  function rows() {
+    return Array.prototype.filter.call(body.rows, function (r) { return r.dataset.sort; });
+  }
+
+  source.addEventListener("case", function (e) {
+    var c = JSON.parse(e.data);
+    var old = document.getElementById("case-" + c.id);
+    if (old) old.remove();
+    if (d.status && c.status !== d.status) return;
+    var all = rows();
+    var first = all[0];
+    var last = all[all.length - 1];
+    // rows sorting outside a middle page belong to an earlier or a later page
+    if (d.firstPage !== "true" && first && c.sort < first.dataset.sort) return;
+    if (d.lastPage !== "true" && last && c.sort > last.dataset.sort) return;
+    var tmp = document.createElement("tbody");
+    tmp.innerHTML = c.html.trim();
+    var row = tmp.firstElementChild;
+    var before = all.find(function (r) { return r.dataset.sort > c.sort; });
+    body.insertBefore(row, before || null);
+  });
+  // a case rescheduled out of this range
+  source.addEventListener("removed", function (e) {
+    var old = document.getElementById("case-" + JSON.parse(e.data).id);
+    if (old) old.remove();
+  });
+  source.addEventListener("reload", function () {
+    source.close();
+    location.reload();
+  });
+})();
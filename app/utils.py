@@ -1,5 +1,5 @@
 from __future__ import annotations
-from datetime import date
+from datetime import date, datetime
 
 def calculate_age_display(dob: date, today: date | None = None) -> str:
     today = today or date.today()
@@ -16,3 +16,11 @@ def calculate_age_display(dob: date, today: date | None = None) -> str:
         remaining_months = months_total - years * 12
         return f"{years} years {remaining_months} months"
     return f"{years} years"
+
+def parse_date_range(start: str | None, end: str | None) -> tuple[date | None, date | None]:
+    if not (start and end):
+        return None, None
+    try:
+        return datetime.strptime(start, "%Y-%m-%d").date(), datetime.strptime(end, "%Y-%m-%d").date()
+    except ValueError:
+        return None, None
@@ -0,0 +1,6 @@
+"""Synthetic data generator and in-process load harness for the MDT app.
+
+    python -m bench generate --scale 10k --db bench.db
+    python -m bench run --db bench.db --out results.json
+    python -m bench compare baseline.json results.json
+"""
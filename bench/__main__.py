@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="MDT App benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("generate", help="Create a database filled with synthetic MDT data")
+    p.add_argument("--db", default="bench.db")
+    p.add_argument("--scale", default="10k", help="10k, 100k, 1m or a number of cases")
+    p.add_argument("--seed", type=int, default=1)
+
+    p = sub.add_parser("run", help="Run the load scenarios against a generated database")
+    p.add_argument("--db", default="bench.db")
+    p.add_argument("--scenarios", default=None, help="comma-separated subset of the scenarios")
+    p.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", default=None, help="write machine-readable results here")
+
+    p = sub.add_parser("compare", help="Compare two result files")
+    p.add_argument("baseline")
+    p.add_argument("current")
+
+    args = parser.parse_args(argv)
+    if args.command in ("generate", "run"):
+        # settings are read when the app is imported, so point it at the bench database first
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{args.db}"
+
+    if args.command == "generate":
+        from .datagen import SCALES, generate
+        if os.path.exists(args.db):
+            sys.exit(f"{args.db} already exists; remove it or pick another --db")
+        cases = SCALES.get(args.scale.lower()) or int(args.scale)
+        generate(os.environ["DATABASE_URL"], cases, seed=args.seed)
+    elif args.command == "run":
+        from .harness import SCENARIOS, run, write_results
+        scenarios = args.scenarios.split(",") if args.scenarios else SCENARIOS
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            sys.exit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        results = asyncio.run(run(args.db, scenarios, args.requests, args.concurrency, args.seed))
+        if args.out:
+            write_results(args.out, results)
+    else:
+        from .harness import compare
+        with open(args.baseline) as a, open(args.current) as b:
+            print("\n".join(compare(json.load(a), json.load(b))))
+
+if __name__ == "__main__":
+    main()
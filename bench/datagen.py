@@ -0,0 +1,145 @@
+import json
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine, insert
+from sqlmodel import SQLModel
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+BENCH_USER = "bench@example.com"
+BENCH_PASSWORD = "benchbench"
+
+_FIRST = ["Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya", "Lakshmi", "Meera", "Mohammed",
+          "Priya", "Rahul", "Ravi", "Saanvi", "Sanjay", "Sara", "Suresh", "Vikram", "Zoya", "Arjun"]
+_LAST = ["Sharma", "Verma", "Iyer", "Nair", "Reddy", "Khan", "Das", "Gupta", "Menon", "Pillai",
+         "Rao", "Singh", "Patel", "Joshi", "Mukherjee", "Bose", "Kulkarni", "Shetty", "Naidu", "Chopra"]
+_SITES = ["lung", "breast", "colon", "rectum", "prostate", "cervix", "ovary", "oral cavity", "stomach", "pancreas"]
+_HISTOLOGY = ["adenocarcinoma", "squamous cell carcinoma", "small cell carcinoma", "lymphoma", "sarcoma", "neuroendocrine tumour"]
+_DISCUSSION = ["staging review", "surgical candidacy", "adjuvant therapy", "response assessment", "palliative options", "recurrence"]
+_PATHOLOGY = ["Biopsy", "FNAC", "Resection specimen", "IHC panel", "Frozen section"]
+_IMAGING = ["CT thorax", "CECT abdomen", "MRI pelvis", "PET-CT", "USG abdomen", "Mammogram"]
+_TREATMENTS = ["Chemo", "Radiotherapy", "Chemo-Radiotherapy", "Surgery"]
+_PROTOCOLS = ["Carboplatin/Paclitaxel", "FOLFOX", "CAPOX", "AC-T", "Cisplatin weekly", "Gemcitabine"]
+
+def _poisson(rnd: random.Random, lam: float) -> int:
+    # Knuth; lam is small here
+    l, k, p = math.exp(-lam), 0, 1.0
+    while True:
+        p *= rnd.random()
+        if p <= l:
+            return k
+        k += 1
+
+def _meeting_days(today: date, weeks_back: int = 156, weeks_ahead: int = 8) -> list[date]:
+    # two MDT meetings a week (Tuesday and Friday) over ~3 years plus the next two months
+    start = today - timedelta(weeks=weeks_back)
+    start -= timedelta(days=start.weekday())
+    days = []
+    for w in range(weeks_back + weeks_ahead):
+        monday = start + timedelta(weeks=w)
+        days += [monday + timedelta(days=1), monday + timedelta(days=4)]
+    return days
+
+def sync_url(database_url: str) -> str:
+    return database_url.replace("+aiosqlite", "")
+
+def generate(database_url: str, cases: int, seed: int = 1, batch_size: int = 10_000, log=print) -> dict:
+    """Fill the database with `cases` MDT cases and proportionate patients/children.
+
+    Distributions: ~1.6 cases per patient (geometric), meetings twice a week with
+    recent meetings busier, ~5% of cases never scheduled, past cases mostly Done with
+    a consensus, future cases Pending; Poisson counts of reports and treatments.
+    """
+    # import late so DATABASE_URL overrides set by the caller are honoured
+    from passlib.hash import bcrypt
+    from app import search  # noqa: F401  registers the FTS/trigram DDL hooks
+    from app.schedule import rebuild_schedule_summary
+    from app.models import (User, Patient, PatientPhone, MDTCase, PathologyReport, ImagingReport,
+                            TreatmentHistory, Consensus)
+
+    rnd = random.Random(seed)
+    engine = create_engine(sync_url(database_url))
+    SQLModel.metadata.create_all(engine)
+    today = date.today()
+    meetings = _meeting_days(today)
+    # later meetings get proportionally more cases (service growth)
+    weights = [1 + i / len(meetings) for i in range(len(meetings))]
+    now = datetime.utcnow()
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{
+            "email": BENCH_USER, "password_hash": bcrypt.hash(BENCH_PASSWORD), "role": "admin",
+            "created_at": now, "active": True,
+        }])
+
+    patient_no = case_no = 0
+    pat_rows, phone_rows, case_rows, path_rows, img_rows, tx_rows, cons_rows = [], [], [], [], [], [], []
+
+    def flush(conn):
+        for table, rows in ((Patient, pat_rows), (PatientPhone, phone_rows), (MDTCase, case_rows),
+                            (PathologyReport, path_rows), (ImagingReport, img_rows),
+                            (TreatmentHistory, tx_rows), (Consensus, cons_rows)):
+            if rows:
+                conn.execute(insert(table.__table__), rows)
+                rows.clear()
+
+    from app.search import patient_phone_rows
+    with engine.begin() as conn:
+        while case_no < cases:
+            patient_no += 1
+            dob = today - timedelta(days=rnd.randint(18 * 365, 90 * 365))
+            phone = f"9{rnd.randint(0, 999_999_999):09d}"
+            extra = [f"9{rnd.randint(0, 999_999_999):09d}" for _ in range(rnd.choice((0, 0, 1, 2)))]
+            pat_rows.append({
+                "id": patient_no, "name": f"{rnd.choice(_FIRST)} {rnd.choice(_LAST)}",
+                "hospital_number": f"HN{patient_no:08d}", "dob": dob, "phone_primary": phone,
+                "address": f"{rnd.randint(1, 999)} Main Road", "pin_code": f"{rnd.randint(110001, 855999)}",
+                "digi_pin": None, "additional_phones_json": json.dumps(extra), "created_at": now, "updated_at": now,
+            })
+            phone_rows.extend(patient_phone_rows(patient_no, phone, json.dumps(extra)))
+
+            n_cases = 1
+            while rnd.random() < 0.375:
+                n_cases += 1
+            for _ in range(min(n_cases, cases - case_no)):
+                case_no += 1
+                site, histology = rnd.choice(_SITES), rnd.choice(_HISTOLOGY)
+                scheduled = None if rnd.random() < 0.05 else rnd.choices(meetings, weights)[0]
+                done = scheduled is not None and scheduled < today and rnd.random() < 0.95
+                case_rows.append({
+                    "id": case_no, "patient_id": patient_no,
+                    "clinical_history": f"Presented with symptoms referable to the {site} for {rnd.randint(1, 12)} months.",
+                    "provisional_diagnosis": f"{histology.capitalize()} of {site}",
+                    "discussion_for": rnd.choice(_DISCUSSION), "scheduled_reason": rnd.choice(_DISCUSSION),
+                    "scheduled_date": scheduled, "status": "Done" if done else "Pending",
+                    "created_at": now, "updated_at": now,
+                })
+                report_day = (scheduled or today) - timedelta(days=rnd.randint(3, 40))
+                for _ in range(_poisson(rnd, 1.5)):
+                    path_rows.append({"mdt_case_id": case_no, "date_of_report": report_day, "report_type": rnd.choice(_PATHOLOGY),
+                                      "investigation_details": f"Features consistent with {histology}."})
+                for _ in range(_poisson(rnd, 2.0)):
+                    img_rows.append({"mdt_case_id": case_no, "date_of_report": report_day, "report_type": rnd.choice(_IMAGING),
+                                     "investigation_details": f"Lesion in {site}, {rnd.randint(8, 80)} mm."})
+                for _ in range(_poisson(rnd, 0.8)):
+                    kind = rnd.choice(_TREATMENTS)
+                    tx_rows.append({"mdt_case_id": case_no, "treatment_type": kind,
+                                    "chemo_protocol": rnd.choice(_PROTOCOLS) if "Chemo" in kind else None,
+                                    "radiation_dose": f"{rnd.choice((45, 50, 60, 66))} Gy" if "Radio" in kind else None,
+                                    "surgery_done": f"Resection of {site}" if kind == "Surgery" else None})
+                if done:
+                    cons_rows.append({"mdt_case_id": case_no, "consensus_text": f"Proceed with {rnd.choice(_TREATMENTS).lower()}.",
+                                      "followups_json": json.dumps(["review in 3 months"]), "created_at": now, "updated_at": now})
+            if len(case_rows) >= batch_size:
+                flush(conn)
+                log(f"  {case_no:,} / {cases:,} cases")
+        flush(conn)
+        # rows went in with plain INSERTs, so the per-date counts are built in one pass
+        rebuild_schedule_summary(conn)
+
+    summary = {"patients": patient_no, "cases": case_no, "seed": seed, "seconds": round(time.perf_counter() - started, 1)}
+    log(f"Generated {summary}")
+    return summary
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import time
+from datetime import date, timedelta
+
+SCENARIOS = ("login", "register", "search_date", "search_hn", "details", "consensus_save", "pdf_preview")
+
+class Sample:
+    """Ids and keys drawn from the database once, so requests hit real rows."""
+
+    def __init__(self, db_path: str, rnd: random.Random, size: int = 2000):
+        con = sqlite3.connect(db_path)
+        try:
+            self.hns = [r[0] for r in con.execute("SELECT hospital_number FROM patient ORDER BY random() LIMIT ?", (size,))]
+            self.case_ids = [r[0] for r in con.execute("SELECT id FROM mdtcase ORDER BY random() LIMIT ?", (size,))]
+            self.pending_ids = [r[0] for r in con.execute(
+                "SELECT id FROM mdtcase WHERE status = 'Pending' ORDER BY random() LIMIT ?", (size,))]
+            self.dates = [date.fromisoformat(r[0]) for r in con.execute(
+                "SELECT DISTINCT scheduled_date FROM mdtcase WHERE scheduled_date IS NOT NULL")]
+        finally:
+            con.close()
+        self.rnd = rnd
+
+    def date_range(self) -> tuple[str, str]:
+        start = self.rnd.choice(self.dates)
+        return start.isoformat(), (start + timedelta(days=self.rnd.choice((0, 7, 30)))).isoformat()
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def _run_scenario(client, name: str, sample: Sample, requests: int, concurrency: int, seq):
+    from .datagen import BENCH_USER, BENCH_PASSWORD
+    rnd = sample.rnd
+
+    async def one():
+        if name == "login":
+            return await client.post("/login", data={"email": BENCH_USER, "password": BENCH_PASSWORD})
+        if name == "register":
+            n = next(seq)
+            return await client.post("/patients/register", data={
+                "name": f"Bench Patient {n}", "hospital_number": f"BENCH{n:09d}", "dob": "1970-01-01",
+                "phone_primary": f"8{n:09d}", "address": "Bench Street", "additional_phones": "[]",
+            })
+        if name == "search_date":
+            start, end = sample.date_range()
+            return await client.get("/search/date", params={"start": start, "end": end})
+        if name == "search_hn":
+            return await client.get("/search/hn", params={"hn": rnd.choice(sample.hns)})
+        if name == "details":
+            return await client.get(f"/cases/{rnd.choice(sample.case_ids)}/details")
+        if name == "consensus_save":
+            return await client.post(f"/cases/{rnd.choice(sample.pending_ids or sample.case_ids)}/consensus",
+                                     data={"consensus_text": "Bench consensus", "followups": "[]"})
+        if name == "pdf_preview":
+            return await client.get(f"/cases/{rnd.choice(sample.case_ids)}/preview.pdf")
+        raise ValueError(name)
+
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            t = time.perf_counter()
+            try:
+                resp = await one()
+                ok = resp.status_code < 400
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - t)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    lat = sorted(l * 1000 for l in latencies)
+    return {
+        "requests": len(lat),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(lat) / wall, 2) if wall else 0.0,
+        "mean_ms": round(statistics.fmean(lat), 2) if lat else 0.0,
+        "p50_ms": round(_percentile(lat, 50), 2),
+        "p95_ms": round(_percentile(lat, 95), 2),
+        "p99_ms": round(_percentile(lat, 99), 2),
+    }
+
+async def run(db_path: str, scenarios=SCENARIOS, requests: int = 200, concurrency: int = 8, seed: int = 1, log=print) -> dict:
+    """Drive the app in-process through httpx's ASGI transport and collect latency stats.
+
+    DATABASE_URL must already point at db_path before this module imports the app.
+    """
+    import itertools
+    import httpx
+    from app.main import app, startup, shutdown
+
+    rnd = random.Random(seed)
+    sample = Sample(db_path, rnd)
+    seq = itertools.count(int(time.time()))
+    await startup()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in scenarios:
+                # one untimed request per scenario warms templates and connections
+                await _run_scenario(client, name, sample, 1, 1, seq)
+                results[name] = await _run_scenario(client, name, sample, requests, concurrency, seq)
+                log(f"  {name:<15} {results[name]['throughput_rps']:>8.1f} req/s  p50 {results[name]['p50_ms']:>8.1f} ms  "
+                    f"p95 {results[name]['p95_ms']:>8.1f} ms  p99 {results[name]['p99_ms']:>8.1f} ms  errors {results[name]['errors']}")
+    finally:
+        await shutdown()
+
+    con = sqlite3.connect(db_path)
+    try:
+        counts = {t: con.execute(f"SELECT count(*) FROM {t}").fetchone()[0] for t in ("patient", "mdtcase")}
+    finally:
+        con.close()
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": requests,
+            "concurrency": concurrency,
+            "seed": seed,
+            "rows": counts,
+        },
+        "scenarios": results,
+    }
+
+def compare(baseline: dict, current: dict) -> list[str]:
+    lines = [f"{'scenario':<15} {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for name, cur in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if not base:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            b, c = base[metric], cur[metric]
+            change = f"{(c - b) / b * 100:+.1f}%" if b else "n/a"
+            lines.append(f"{name:<15} {metric:<15} {b:>10.2f} {c:>10.2f} {change:>8}")
+    return lines
+
+def write_results(path: str, results: dict):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
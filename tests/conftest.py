@@ -0,0 +1,66 @@
+import asyncio
+import itertools
+from collections import Counter
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+
+import pytest
+
+# settings are read at import time, so the environment has to be in place before app is imported
+_tmp = tempfile.mkdtemp(prefix="mdt-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/test.db"
+os.environ["JOB_WORKERS"] = "0"
+os.environ["JOB_RESULTS_DIR"] = os.path.join(_tmp, "job_results")
+os.environ["JINJA_CACHE_DIR"] = ""
+
+import app.main  # noqa: E402,F401  registers every schema hook (FTS, archive, schedule summary)
+from app.db import async_session, dispose_engines, init_db  # noqa: E402
+from app.models import MDTCase, Patient  # noqa: E402
+
+_numbers = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine on the one event loop all tests share (pooled connections are tied to it)."""
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(init_db())
+    yield loop.run_until_complete
+    loop.run_until_complete(dispose_engines())
+    loop.close()
+
+async def make_patient(**fields) -> Patient:
+    n = next(_numbers)
+    values = dict(name=f"Patient {n}", hospital_number=f"HN{n:06d}", dob=date(1960, 1, 1),
+                  phone_primary=f"98765{n:05d}", address="1 Test Road")
+    values.update(fields)
+    async with async_session() as sess:
+        patient = Patient(**values)
+        sess.add(patient)
+        await sess.commit()
+        await sess.refresh(patient)
+        return patient
+
+async def make_case(patient: Patient | None = None, **fields) -> MDTCase:
+    from app.schedule import adjust_schedule_counts, schedule_key
+    patient = patient or await make_patient()
+    async with async_session() as sess:
+        case = MDTCase(patient_id=patient.id, **fields)
+        sess.add(case)
+        await adjust_schedule_counts(sess, Counter({schedule_key(case): 1}))
+        await sess.commit()
+        await sess.refresh(case)
+        return case
+
+def days_ago(n: int) -> datetime:
+    return datetime.utcnow() - timedelta(days=n)
+
+@pytest.fixture
+def client():
+    """An admin-authenticated HTTP client for the app (no lifespan: the run fixture set up the DB)."""
+    import httpx
+    from app.main import app
+    from app.security import SESSION_COOKIE, serializer
+    c = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    c.cookies.set(SESSION_COOKIE, serializer.dumps({"user_id": 1, "role": "admin"}))
+    return c
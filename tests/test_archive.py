@@ -0,0 +1,137 @@
+import os
+import tempfile
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, text, update
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateTable
+from sqlmodel import SQLModel
+
+from app.archive import _copy_batch, _delete_batch, archive_done_cases, archived_cases_for_hn
+from app.db import async_session, engine, read_session
+from app.loader import invalidate_case, load_case
+from app.models import Consensus, MDTCase
+from conftest import days_ago, make_case, make_patient
+
+async def _age(*case_ids, days=400):
+    async with async_session() as sess:
+        await sess.execute(update(MDTCase).where(MDTCase.id.in_(case_ids)).values(updated_at=days_ago(days)))
+        await sess.commit()
+
+async def _in(schema: str, table: str, case_id: int, key: str = "id") -> int:
+    async with engine.connect() as conn:
+        return (await conn.execute(text(f"SELECT count(*) FROM {schema}.{table} WHERE {key} = :id"), {"id": case_id})).scalar()
+
+def test_archive_moves_old_done_cases_with_children(run):
+    async def scenario():
+        patient = await make_patient()
+        old = await make_case(patient, status="Done", scheduled_date=date(2020, 1, 6))
+        recent = await make_case(patient, status="Done", scheduled_date=date(2020, 1, 13))
+        pending = await make_case(patient, scheduled_date=date(2020, 1, 20))
+        async with async_session() as sess:
+            sess.add(Consensus(mdt_case_id=old.id, consensus_text="Surgery"))
+            await sess.commit()
+        await _age(old.id, pending.id)
+        await _age(recent.id, days=1)
+
+        await archive_done_cases(older_than_days=365, batch_size=1)
+
+        assert await _in("main", "mdtcase", old.id) == 0
+        assert await _in("archive", "mdtcase", old.id) == 1
+        assert await _in("main", "consensus", old.id, "mdt_case_id") == 0
+        assert await _in("archive", "consensus", old.id, "mdt_case_id") == 1
+        assert await _in("main", "mdtcase", recent.id) == 1
+        assert await _in("main", "mdtcase", pending.id) == 1
+    run(scenario())
+
+def test_archived_case_falls_through_to_archive(run):
+    async def scenario():
+        patient = await make_patient()
+        case = await make_case(patient, status="Done", scheduled_date=date(2020, 2, 3))
+        async with async_session() as sess:
+            sess.add(Consensus(mdt_case_id=case.id, consensus_text="Chemo"))
+            await sess.commit()
+        await _age(case.id)
+        await archive_done_cases(older_than_days=365)
+        invalidate_case(case.id)
+
+        entry = await load_case(case.id)
+        assert entry is not None and entry.archived
+        assert entry.case.patient.hospital_number == patient.hospital_number
+        assert entry.case.consensus.consensus_text == "Chemo"
+        async with read_session() as sess:
+            assert [c.id for c in await archived_cases_for_hn(sess, patient.hospital_number)] == [case.id]
+    run(scenario())
+
+def test_interrupted_batch_is_copied_again(run):
+    async def scenario():
+        case = await make_case(status="Done", scheduled_date=date(2020, 3, 2))
+        await _age(case.id)
+        # a crash after the copy committed leaves the case in both files
+        async with engine.begin() as conn:
+            await conn.run_sync(_copy_batch, [case.id])
+        assert await _in("archive", "mdtcase", case.id) == 1
+        invalidate_case(case.id)
+        assert not (await load_case(case.id)).archived
+
+        await archive_done_cases(older_than_days=365)
+        assert await _in("main", "mdtcase", case.id) == 0
+        assert await _in("archive", "mdtcase", case.id) == 1
+    run(scenario())
+
+def test_archived_ids_are_not_handed_out_again(run):
+    async def scenario():
+        patient = await make_patient()
+        newest = await make_case(patient, status="Done", scheduled_date=date(2020, 4, 6))
+        await _age(newest.id)
+        await archive_done_cases(older_than_days=365)
+        assert await _in("archive", "mdtcase", newest.id) == 1
+
+        other = await make_case(scheduled_date=date(2020, 4, 6))
+        assert other.id > newest.id
+        invalidate_case(newest.id)
+        entry = await load_case(newest.id)
+        assert entry.archived and entry.case.patient_id == patient.id
+    run(scenario())
+
+def test_case_edited_after_the_copy_stays_in_main(run):
+    async def scenario():
+        case = await make_case(status="Done", scheduled_date=date(2020, 5, 4))
+        await _age(case.id)
+        cutoff = days_ago(365)
+        async with engine.begin() as conn:
+            assert await conn.run_sync(_copy_batch, [case.id]) == [case.id]
+        # an edit commits between the two transactions
+        async with async_session() as sess:
+            await sess.execute(update(MDTCase).where(MDTCase.id == case.id).values(clinical_history="late edit", updated_at=datetime.utcnow()))
+            await sess.commit()
+        async with engine.begin() as conn:
+            assert await conn.run_sync(_delete_batch, [case.id], cutoff) == []
+        assert await _in("main", "mdtcase", case.id) == 1
+        assert await _in("archive", "mdtcase", case.id) == 0
+    run(scenario())
+
+def test_existing_tables_are_rebuilt_with_autoincrement():
+    tmp = tempfile.mkdtemp()
+    eng = create_engine(f"sqlite:///{os.path.join(tmp, 'legacy.db')}")
+    with eng.begin() as conn:
+        conn.exec_driver_sql("ATTACH DATABASE ? AS archive", (os.path.join(tmp, "legacy_archive.db"),))
+        # the schema as created before the cases were AUTOINCREMENT, with a case already archived
+        for table in SQLModel.metadata.sorted_tables:
+            conn.exec_driver_sql(str(CreateTable(table).compile(dialect=sqlite.dialect())).replace(" AUTOINCREMENT", ""))
+        conn.exec_driver_sql("CREATE TABLE archive.mdtcase (id INTEGER PRIMARY KEY, patient_id INTEGER, status VARCHAR)")
+        conn.exec_driver_sql("INSERT INTO archive.mdtcase (id, patient_id, status) VALUES (50, 1, 'Done')")
+        conn.exec_driver_sql("INSERT INTO patient (id, name, hospital_number, dob, phone_primary, address, created_at, updated_at) "
+                             "VALUES (1, 'A', 'L1', '1970-01-01', '1', 'x', '2020-01-01', '2020-01-01')")
+        conn.exec_driver_sql("INSERT INTO mdtcase (id, patient_id, status, created_at, updated_at) VALUES (7, 1, 'Pending', '2020-01-01', '2020-01-01')")
+
+        SQLModel.metadata.create_all(conn)
+
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'mdtcase'").scalar()
+        assert "AUTOINCREMENT" in ddl
+        assert conn.exec_driver_sql("SELECT patient_id FROM mdtcase WHERE id = 7").scalar() == 1
+        conn.exec_driver_sql("INSERT INTO mdtcase (patient_id, status, created_at, updated_at) VALUES (1, 'Pending', '2020-01-01', '2020-01-01')")
+        assert conn.exec_driver_sql("SELECT max(id) FROM mdtcase").scalar() == 51
+        # triggers dropped with the old table are back
+        assert conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'mdtcase_fts_ai'").first()
+    eng.dispose()
@@ -0,0 +1,31 @@
+from app.compression import decoded_etag, encoded_etag
+from conftest import make_case
+
+def test_etag_round_trip():
+    assert encoded_etag(b'"details-ab"', "gzip") == b'"details-ab-gzip"'
+    assert encoded_etag(b'W/"v1"', "br") == b'W/"v1-br"'
+    assert decoded_etag('"details-ab-gzip"') == decoded_etag('"details-ab"') == '"details-ab"'
+
+def test_compressed_page_has_its_own_etag(run, client):
+    async def scenario():
+        case = await make_case(clinical_history="x" * 2000)
+        url = f"/cases/{case.id}/details"
+        plain = await client.get(url, headers={"Accept-Encoding": "identity"})
+        gzipped = await client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert gzipped.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+
+        again = await client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]})
+        assert again.status_code == 304 and again.headers["etag"] == gzipped.headers["etag"]
+        again = await client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": plain.headers["etag"]})
+        assert again.status_code == 304 and again.headers["etag"] == plain.headers["etag"]
+    run(scenario())
+
+def test_static_revalidation_accepts_encoded_etag(run, client):
+    async def scenario():
+        url = "/static/js/live_cases.js"
+        first = await client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert first.headers["etag"].endswith('-gzip"')
+        again = await client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+        assert again.status_code == 304 and again.headers["etag"] == first.headers["etag"]
+    run(scenario())
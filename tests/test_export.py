@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+from datetime import date
+
+from sqlalchemy import update
+
+from app.archive import archive_done_cases
+from app.db import async_session
+from app.export import CSV_HEADER, export_stream
+from app.models import Consensus, MDTCase
+from conftest import days_ago, make_case, make_patient
+
+START, END = date(2018, 9, 1), date(2018, 9, 30)
+
+async def _export(fmt: str, **kw) -> str:
+    return "".join([part async for part in export_stream(fmt, START, END, **kw)])
+
+def test_export_includes_archived_cases(run):
+    async def scenario():
+        patient = await make_patient()
+        live = await make_case(patient, scheduled_date=date(2018, 9, 4))
+        old = await make_case(patient, status="Done", scheduled_date=date(2018, 9, 11))
+        async with async_session() as sess:
+            sess.add(Consensus(mdt_case_id=old.id, consensus_text="Observe"))
+            await sess.execute(update(MDTCase).where(MDTCase.id == old.id).values(updated_at=days_ago(400)))
+            await sess.commit()
+        await archive_done_cases(older_than_days=365)
+
+        records = [json.loads(line) for line in (await _export("ndjson")).splitlines()]
+        assert [(r["id"], r["archived"]) for r in records] == [(live.id, False), (old.id, True)]
+        assert records[1]["consensus"]["consensus_text"] == "Observe"
+        assert records[1]["patient"]["hospital_number"] == patient.hospital_number
+
+        assert [json.loads(line)["id"] for line in (await _export("ndjson", include_archived=False)).splitlines()] == [live.id]
+        rows = list(csv.reader(io.StringIO(await _export("csv"))))
+        assert rows[0] == CSV_HEADER and len(rows) == 3
+    run(scenario())
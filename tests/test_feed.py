@@ -0,0 +1,35 @@
+from datetime import date
+
+from app.feed import ChangeFeed
+from app.models import MDTCase
+
+OLD = date(2022, 3, 1)
+NEW = date(2022, 3, 29)
+
+def _row(case: MDTCase) -> str:
+    return f"<tr id='case-{case.id}'></tr>"
+
+def test_reschedule_reaches_viewers_of_both_dates():
+    feed = ChangeFeed(queue_size=10)
+    old_viewer = feed.subscribe(date(2022, 3, 1), date(2022, 3, 7))
+    new_viewer = feed.subscribe(date(2022, 3, 28), date(2022, 4, 3))
+    bystander = feed.subscribe(date(2022, 5, 1), date(2022, 5, 7))
+    case = MDTCase(id=7, patient_id=1, scheduled_date=NEW, status="Pending")
+
+    feed.publish([case], previous_dates={7: OLD})
+
+    assert old_viewer.event(old_viewer.queue.get_nowait(), _row) == 'event: removed\ndata: {"id": 7}\n\n'
+    assert new_viewer.event(new_viewer.queue.get_nowait(), _row).startswith("event: case\n")
+    assert bystander.queue.empty()
+
+def test_unscheduling_removes_the_row():
+    feed = ChangeFeed(queue_size=10)
+    viewer = feed.subscribe(date(2022, 3, 1), date(2022, 3, 7))
+    feed.publish([MDTCase(id=8, patient_id=1, scheduled_date=None)], previous_dates={8: OLD})
+    assert viewer.event(viewer.queue.get_nowait(), _row).startswith("event: removed\n")
+
+def test_full_queue_drops_the_subscriber():
+    feed = ChangeFeed(queue_size=1)
+    viewer = feed.subscribe(OLD, NEW)
+    feed.publish([MDTCase(id=i, patient_id=1, scheduled_date=OLD) for i in (1, 2)])
+    assert viewer.overflowed and not feed.active
@@ -0,0 +1,43 @@
+from sqlalchemy import update
+
+from app.db import async_session, read_session
+from app.meeting import ConsensusItem, save_consensus_batch
+from app.models import MDTCase
+from app.search import search_cases_text
+from conftest import make_case
+
+async def _hits(q: str, field: str | None = None) -> list[int]:
+    async with read_session() as sess:
+        return [c.id for c, _ in await search_cases_text(sess, q, field=field)]
+
+def test_case_inserts_and_updates_are_indexed(run):
+    async def scenario():
+        case = await make_case(clinical_history="Longstanding xylophonic cough", provisional_diagnosis="Quokkoma")
+        assert await _hits("xylophonic") == [case.id]
+        assert await _hits("quokk*") == [case.id]
+        assert await _hits("xylophonic", field="provisional_diagnosis") == []
+
+        # a bulk UPDATE bypasses the ORM; the trigger still sees it
+        async with async_session() as sess:
+            await sess.execute(update(MDTCase).where(MDTCase.id == case.id).values(clinical_history="Zebroid dysphagia"))
+            await sess.commit()
+        assert await _hits("xylophonic") == []
+        assert await _hits("zebroid") == [case.id]
+    run(scenario())
+
+def test_consensus_upsert_is_indexed(run):
+    async def scenario():
+        case = await make_case(clinical_history="history")
+        await save_consensus_batch([ConsensusItem(case_id=case.id, consensus_text="Proceed to wombatectomy")])
+        assert await _hits("wombatectomy", field="consensus_text") == [case.id]
+        # the second save takes the ON CONFLICT DO UPDATE path
+        await save_consensus_batch([ConsensusItem(case_id=case.id, consensus_text="Refer for platypusotherapy")])
+        assert await _hits("wombatectomy") == []
+        assert await _hits("platypusotherapy") == [case.id]
+    run(scenario())
+
+def test_query_syntax_is_neutralised(run):
+    async def scenario():
+        for q in ('"', "- (", "NEAR(", "a OR", "*"):
+            assert await _hits(q) == []
+    run(scenario())
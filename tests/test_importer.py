@@ -0,0 +1,43 @@
+import io
+
+from app.db import read_session
+from app.importer import import_records, iter_records
+from app.search import search_patients
+from conftest import make_patient
+
+CSV = """name,hospital_number,dob,phone_primary,address
+Asha Rao,IMP001,1970-02-03,9811100001,1 Lake Road
+Asha Rao,IMP001,1970-02-03,9811100001,1 Lake Road
+Bala Iyer,IMP002,1965-07-08,9811100002,2 Lake Road
+Chitra Nair,IMP003,1980-11-12,9811100003,3 Lake Road
+Chitra Nair,IMP003,1980-11-12,9811100003,3 Lake Road
+Dev Menon,IMP900,not-a-date,9811100004,4 Lake Road
+"""
+
+def _records(text: str, fmt: str = "csv"):
+    return iter_records(io.BytesIO(text.encode()), fmt)
+
+def test_patient_import_skips_duplicates(run):
+    async def scenario():
+        await make_patient(hospital_number="IMP002")
+        # batch_size 2 puts the second IMP003 in a later batch than the first
+        report = await import_records("patients", _records(CSV), batch_size=2)
+        async with read_session() as sess:
+            by_phone = await search_patients(sess, "9811100003")
+        return report.as_dict(), by_phone
+    report, by_phone = run(scenario())
+    assert (report["rows"], report["inserted"], report["duplicates"], report["failed"]) == (6, 2, 3, 1)
+    assert sorted(e["row"] for e in report["errors"]) == [3, 4, 6, 7]
+    assert [p.hospital_number for p in by_phone] == ["IMP003"]
+
+def test_case_import_reports_unknown_patients(run):
+    async def scenario():
+        patient = await make_patient()
+        ndjson = (
+            f'{{"hospital_number": "{patient.hospital_number}", "scheduled_date": "2024-01-09", "consensus_text": "Surgery"}}\n'
+            '{"hospital_number": "NOPE"}\n'
+            "not json\n"
+        )
+        return (await import_records("cases", _records(ndjson, "ndjson"))).as_dict()
+    report = run(scenario())
+    assert (report["rows"], report["inserted"], report["failed"]) == (3, 1, 2)
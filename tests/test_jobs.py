@@ -0,0 +1,130 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update
+
+from app import jobs
+from app.config import settings
+from app.db import async_session
+from app.models import Job
+
+async def _reset():
+    async with async_session() as sess:
+        await sess.execute(delete(Job))
+        await sess.commit()
+
+async def _set(job_id: int, **values):
+    async with async_session() as sess:
+        await sess.execute(update(Job).where(Job.id == job_id).values(**values))
+        await sess.commit()
+
+def test_claim_takes_each_job_once(run):
+    async def scenario():
+        await _reset()
+        first = await jobs.submit_job("case_pdf", {"case_id": 1})
+        second = await jobs.submit_job("case_pdf", {"case_id": 2})
+        a = await jobs._claim("w1")
+        b = await jobs._claim("w2")
+        assert (a.id, a.status, a.locked_by, a.attempts) == (first.id, "running", "w1", 1)
+        assert (b.id, b.locked_by) == (second.id, "w2")
+        assert await jobs._claim("w3") is None
+    run(scenario())
+
+def test_failure_retries_with_backoff_then_fails(run):
+    async def scenario():
+        await _reset()
+        job = await jobs.submit_job("case_pdf", {"case_id": 1}, max_attempts=2)
+        claimed = await jobs._claim("w1")
+        await jobs._finish(claimed, error=RuntimeError("boom"))
+        queued = await jobs.get_job(job.id)
+        assert queued.status == "queued" and "boom" in queued.error
+        assert queued.run_after >= datetime.utcnow() + timedelta(seconds=settings.job_retry_backoff_s) - timedelta(seconds=1)
+        assert await jobs._claim("w1") is None  # still backing off
+
+        await _set(job.id, run_after=datetime.utcnow())
+        claimed = await jobs._claim("w1")
+        assert claimed.attempts == 2
+        await jobs._finish(claimed, error=RuntimeError("boom again"))
+        assert (await jobs.get_job(job.id)).status == "failed"
+    run(scenario())
+
+def test_permanent_error_is_not_retried(run):
+    async def scenario():
+        await _reset()
+        job = await jobs.submit_job("case_pdf", {"case_id": 10 ** 9})
+        await jobs._run(await jobs._claim("w1"))
+        failed = await jobs.get_job(job.id)
+        assert (failed.status, failed.attempts) == ("failed", 1)
+        assert "Case not found" in failed.error
+    run(scenario())
+
+def test_expired_lease_is_requeued(run):
+    async def scenario():
+        await _reset()
+        job = await jobs.submit_job("case_pdf", {"case_id": 1})
+        await jobs._claim("dead-worker")
+        await jobs._housekeeping()
+        assert (await jobs.get_job(job.id)).status == "running"  # lease still valid
+
+        await _set(job.id, locked_at=datetime.utcnow() - timedelta(seconds=settings.job_lease_s + 1))
+        await jobs._housekeeping()
+        requeued = await jobs.get_job(job.id)
+        assert (requeued.status, requeued.locked_by) == ("queued", None)
+        assert (await jobs._claim("w2")).id == job.id
+    run(scenario())
+
+def test_lost_job_out_of_attempts_fails(run):
+    async def scenario():
+        await _reset()
+        job = await jobs.submit_job("case_pdf", {"case_id": 1}, max_attempts=1)
+        await jobs._claim("dead-worker")
+        await _set(job.id, locked_at=datetime.utcnow() - timedelta(seconds=settings.job_lease_s + 1))
+        await jobs._housekeeping()
+        failed = await jobs.get_job(job.id)
+        assert (failed.status, failed.locked_by) == ("failed", None)
+        assert "lease expired" in failed.error
+        assert await jobs._claim("w2") is None
+    run(scenario())
+
+def test_admin_only_jobs_need_an_admin_to_read(run, client):
+    async def scenario():
+        from app.security import SESSION_COOKIE, serializer
+        await _reset()
+        job = await jobs.submit_job("archive", {"days": 10 ** 6})
+        assert (await client.get(f"/jobs/{job.id}")).status_code == 200
+        client.cookies.set(SESSION_COOKIE, serializer.dumps({"user_id": 2, "role": "user"}))
+        assert (await client.get(f"/jobs/{job.id}")).status_code == 403
+        assert (await client.get(f"/jobs/{job.id}/result")).status_code == 403
+        client.cookies.clear()
+        assert (await client.get(f"/jobs/{job.id}")).status_code == 302
+    run(scenario())
+
+def test_background_import_and_export(run, client):
+    async def scenario():
+        await _reset()
+        csv_body = b"name,hospital_number,dob,phone_primary,address\nJaya Pillai,BGJ001,1975-05-06,9822200001,5 Hill Road\n"
+        r = await client.post("/admin/import/patients?background=1", files={"file": ("p.csv", csv_body)})
+        assert r.status_code == 202
+        job = await jobs._claim("w1")
+        assert job.max_attempts == 1
+        await jobs._run(job)
+        r = await client.get(f"/jobs/{job.id}/result")
+        assert r.json()["inserted"] == 1
+        assert not any(n.startswith("upload-") for n in os.listdir(settings.job_results_dir))
+
+        r = await client.get("/admin/export/cases?background=1&format=csv")
+        assert r.status_code == 202
+        await jobs._run(await jobs._claim("w1"))
+        r = await client.get(r.headers["location"] + "/result")
+        assert r.status_code == 200 and r.text.startswith("id,")
+    run(scenario())
+
+def test_import_job_only_reads_uploads(run, tmp_path):
+    async def scenario():
+        await _reset()
+        victim = tmp_path / "upload-keep.csv"
+        victim.write_text("x")
+        await jobs.submit_job("import", {"kind": "patients", "format": "csv", "upload": str(victim)}, max_attempts=1)
+        await jobs._run(await jobs._claim("w1"))
+        assert victim.exists()
+    run(scenario())
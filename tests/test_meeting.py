@@ -0,0 +1,38 @@
+from datetime import date
+
+from app.loader import load_case
+from conftest import make_case, make_patient
+
+DAY = date(2023, 6, 6)
+
+def test_worksheet_saves_only_changed_rows(run, client):
+    async def scenario():
+        patient = await make_patient()
+        saved = await make_case(patient, scheduled_date=DAY)
+        fresh = await make_case(patient, scheduled_date=DAY)
+        r = await client.post(f"/meeting?date={DAY}", data={f"consensus_{saved.id}": "Surgery\r\nthen review",
+                                                            f"followups_{saved.id}": '["CT in 3 months"]'})
+        assert r.status_code == 200
+        stamp = (await load_case(saved.id)).case.updated_at
+
+        # the worksheet re-posts the pre-filled row alongside the new one
+        r = await client.post(f"/meeting?date={DAY}", data={
+            f"consensus_{saved.id}": "Surgery\r\nthen review", f"followups_{saved.id}": '["CT in 3 months"]',
+            f"consensus_{fresh.id}": "Chemo", f"followups_{fresh.id}": "",
+        })
+        assert r.status_code == 200
+        assert f"Case #{fresh.id}: saved" in r.text
+        assert f"Case #{saved.id}: saved" not in r.text
+        assert (await load_case(saved.id)).case.updated_at == stamp
+        assert (await load_case(fresh.id)).case.status == "Done"
+    run(scenario())
+
+def test_worksheet_reports_malformed_keys(run, client):
+    async def scenario():
+        case = await make_case(scheduled_date=DAY)
+        r = await client.post(f"/meeting?date={DAY}", data={"consensus_x": "a", f"consensus_{case.id}": "b",
+                                                            f"followups_{case.id}": "not json"})
+        assert r.status_code == 200
+        assert "Case #x: invalid case id" in r.text
+        assert f"Case #{case.id}: invalid followups" in r.text
+    run(scenario())
@@ -0,0 +1,23 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import pdf
+
+def test_broken_pool_is_replaced_and_retried(run, monkeypatch):
+    # builtins only: whatever runs in the pool has to be importable by the spawned workers
+    monkeypatch.setattr(pdf, "_write_pdf", str.encode)
+
+    async def scenario():
+        broken = pdf.get_pool()
+        # a worker dying mid-render, as on an OOM kill
+        with pytest.raises(BrokenProcessPool):
+            await asyncio.get_running_loop().run_in_executor(broken, os._exit, 1)
+        assert await pdf.render_pdf("<p>x</p>") == b"<p>x</p>"
+        assert pdf._pool is not broken
+    try:
+        run(scenario())
+    finally:
+        pdf.shutdown_pool()
@@ -0,0 +1,59 @@
+from collections import Counter
+from datetime import date
+
+from sqlalchemy import delete, update
+
+from app.db import async_session, init_db, read_session
+from app.models import MDTCase, ScheduleSummary
+from app.schedule import adjust_schedule_counts, moved, schedule_calendar
+from conftest import make_case
+
+DAY = date(2021, 5, 4)
+NEXT = date(2021, 5, 7)
+
+async def _calendar():
+    async with read_session() as sess:
+        return await schedule_calendar(sess, DAY, NEXT)
+
+def test_counts_follow_deltas(run):
+    async def scenario():
+        before = await _calendar()
+        first = await make_case(scheduled_date=DAY)
+        await make_case(scheduled_date=DAY)
+        unscheduled = await make_case()
+        cal = await _calendar()
+        assert cal["days"][DAY] == {"Pending": 2, "Done": 0}
+        assert cal["unscheduled"] == before["unscheduled"] + 1
+
+        async with async_session() as sess:
+            await sess.execute(update(MDTCase).where(MDTCase.id == first.id).values(scheduled_date=NEXT, status="Done"))
+            await adjust_schedule_counts(sess, moved((DAY, "Pending"), (NEXT, "Done")))
+            await sess.execute(update(MDTCase).where(MDTCase.id == unscheduled.id).values(scheduled_date=DAY))
+            # the unscheduled row is keyed on NULL and must be found again, not duplicated
+            await adjust_schedule_counts(sess, moved((None, "Pending"), (DAY, "Pending")))
+            await sess.commit()
+        cal = await _calendar()
+        assert cal["days"][DAY] == {"Pending": 2, "Done": 0}
+        assert cal["days"][NEXT] == {"Pending": 0, "Done": 1}
+        assert cal["unscheduled"] == before["unscheduled"]
+
+        async with read_session() as sess:
+            q = ScheduleSummary.__table__.select().where(ScheduleSummary.scheduled_date.is_(None), ScheduleSummary.status == "Pending")
+            rows = (await sess.exec(q)).all()
+        assert len(rows) == 1
+    run(scenario())
+
+def test_moved_is_empty_when_key_unchanged():
+    assert moved((DAY, "Pending"), (DAY, "Pending")) == Counter()
+
+def test_empty_summary_is_backfilled(run):
+    async def scenario():
+        await make_case(scheduled_date=DAY)
+        expected = await _calendar()
+        # as left behind by a bulk load that doesn't maintain the summary
+        async with async_session() as sess:
+            await sess.execute(delete(ScheduleSummary))
+            await sess.commit()
+        await init_db(force=True)
+        assert await _calendar() == expected
+    run(scenario())
@@ -0,0 +1,55 @@
+from datetime import date
+
+from app.config import settings
+from app.db import read_session
+from app.search import clamp_page_size, clamp_patient_limit, search_cases_page, search_patients
+from conftest import make_case, make_patient
+
+START, END = date(2019, 4, 1), date(2019, 4, 30)
+
+async def _walk(limit: int, status: str | None = None) -> list[list[int]]:
+    pages, cursor = [], None
+    async with read_session() as sess:
+        while True:
+            items, cursor = await search_cases_page(sess, START, END, status=status, after=cursor, limit=limit)
+            pages.append([c.id for c in items])
+            if cursor is None:
+                return pages
+
+def test_keyset_pages_cover_the_range_in_order(run):
+    async def scenario():
+        patient = await make_patient()
+        created = []
+        for day, status in ((2, "Done"), (2, "Pending"), (2, "Done"), (9, "Pending"), (16, "Done"), (16, "Pending"), (23, "Pending")):
+            created.append(await make_case(patient, scheduled_date=date(2019, 4, day), status=status))
+        await make_case(patient, scheduled_date=date(2019, 5, 1))  # outside the range
+        expected = [c.id for c in sorted(created, key=lambda c: (c.scheduled_date, c.status, c.id))]
+
+        pages = await _walk(limit=3)
+        assert [len(p) for p in pages] == [3, 3, 1]
+        assert sum(pages, []) == expected
+        # an exact multiple of the page size ends without an empty trailing page
+        assert [len(p) for p in await _walk(limit=7)] == [7]
+        assert sum(await _walk(limit=2, status="Done"), []) == [c.id for c in sorted(created, key=lambda c: (c.scheduled_date, c.id)) if c.status == "Done"]
+
+        async with read_session() as sess:
+            items, _ = await search_cases_page(sess, START, END, after="not-a-cursor", limit=50)
+        assert [c.id for c in items] == expected
+    run(scenario())
+
+def test_limits_are_clamped():
+    for clamp, default, maximum in (
+        (clamp_page_size, settings.search_page_size, settings.search_max_page_size),
+        (clamp_patient_limit, settings.patient_search_limit, settings.patient_search_max_limit),
+    ):
+        assert clamp(None) == clamp(0) == clamp(-5) == default
+        assert clamp(3) == 3
+        assert clamp(10 ** 9) == maximum
+
+def test_patient_search_honours_negative_limit(run):
+    async def scenario():
+        patient = await make_patient(name="Zubin Quartermaine")
+        async with read_session() as sess:
+            return await search_patients(sess, "Quartermaine", limit=-1), patient
+    found, patient = run(scenario())
+    assert [p.id for p in found] == [patient.id]
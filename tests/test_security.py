@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from app import security
+from app.config import settings
+
+def _slow(seconds: float) -> float:
+    import time
+    time.sleep(seconds)
+    return seconds
+
+def test_per_ip_cap_is_off_by_default(run):
+    async def scenario():
+        return await asyncio.gather(*(security._run(_slow, 0.05, client="10.0.0.1") for _ in range(4)))
+    assert settings.password_per_ip == 0
+    assert run(scenario()) == [0.05] * 4
+
+def test_per_ip_cap_refuses_extra_attempts(run, monkeypatch):
+    monkeypatch.setattr(settings, "password_per_ip", 1)
+
+    async def scenario():
+        first = asyncio.ensure_future(security._run(_slow, 0.1, client="10.0.0.2"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(security.PasswordBusy):
+            await security._run(_slow, 0, client="10.0.0.2")
+        # another address is unaffected
+        assert await security._run(_slow, 0, client="10.0.0.3") == 0
+        return await first
+    assert run(scenario()) == 0.1